@@ -0,0 +1,52 @@
+import numpy as np
+cimport numpy as cnp
+cimport cython
+from cython cimport floating
+
+cnp.import_array()
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef inline void sq_moments3d(const floating[:, :, :] data, double[::1] mean,
+                              double[::1] m2) noexcept nogil:
+    cdef Py_ssize_t c, i, t, n_ch = data.shape[0], n_i = data.shape[1], \
+        n_t = data.shape[2]
+    cdef double v, mu, dev, acc
+
+    # the loops only index the memoryview, so any strides work and the data
+    # is never copied into a contiguous buffer
+    for c in range(n_ch):
+        # mean of the squares, where exact zeros count as a tiny power
+        acc = 0.
+        for i in range(n_i):
+            for t in range(n_t):
+                v = <double>data[c, i, t] * data[c, i, t]
+                if v == 0.:
+                    v = 1e-9
+                acc = acc + v
+        mu = acc / (n_i * n_t)
+
+        # squared deviations from the mean of the squares
+        acc = 0.
+        for i in range(n_i):
+            for t in range(n_t):
+                v = <double>data[c, i, t] * data[c, i, t]
+                if v == 0.:
+                    v = 1e-9
+                dev = v - mu
+                acc = acc + dev * dev
+        mean[c] = mu
+        m2[c] = acc
+
+cpdef tuple sq_moments(const floating[:, :, :] data):
+    cdef cnp.ndarray mean = np.empty(data.shape[0], dtype=np.float64)
+    cdef cnp.ndarray m2 = np.empty(data.shape[0], dtype=np.float64)
+    cdef double[::1] mean_view = mean, m2_view = m2
+
+    if data.shape[1] == 0 or data.shape[2] == 0:
+        raise ValueError("data must have at least one sample per row")
+
+    with nogil:
+        sq_moments3d(data, mean_view, m2_view)
+    return mean, m2
@@ -0,0 +1,33 @@
+import numpy as np
+cimport numpy as cnp
+cimport cython
+
+cnp.import_array()
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void overlap_add1d(const double[:, :] chunks,
+                               const double[::1] window, double[::1] out,
+                               Py_ssize_t start, Py_ssize_t step
+                               ) noexcept nogil:
+    cdef Py_ssize_t w, t, offset, n_win = chunks.shape[0]
+    cdef Py_ssize_t n = chunks.shape[1]
+
+    for w in range(n_win):
+        offset = start + w * step
+        for t in range(n):
+            out[offset + t] += chunks[w, t] * window[t]
+
+cpdef void overlap_add(const double[:, :] chunks, const double[::1] window,
+                       double[::1] out, Py_ssize_t start, Py_ssize_t step):
+    cdef Py_ssize_t n_win = chunks.shape[0]
+
+    if chunks.shape[1] != window.shape[0]:
+        raise ValueError("chunks and window must have the same length")
+    if n_win > 0 and (start < 0 or step < 0 or
+                      start + (n_win - 1) * step + window.shape[0]
+                      > out.shape[0]):
+        raise ValueError("chunks do not fit in the output array")
+
+    with nogil:
+        overlap_add1d(chunks, window, out, start, step)
@@ -0,0 +1,54 @@
+import numpy as np
+cimport numpy as cnp
+cimport cython
+from libc.math cimport cos, sin
+
+cnp.import_array()
+
+cdef enum:
+    BLOCK = 4096
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef inline void sinusoids1d(const double[::1] mag, const double[::1] phase,
+                             const double[::1] omega, double[:, ::1] z,
+                             double[::1] out) noexcept nogil:
+    cdef Py_ssize_t t, t0, stop, k, n = out.shape[0], n_sin = mag.shape[0]
+    cdef double s, re, im
+
+    for k in range(n_sin):
+        z[2, k] = cos(omega[k])
+        z[3, k] = sin(omega[k])
+
+    # each sinusoid is carried as a phasor that is rotated by a fixed step
+    # every sample. The phasors are re-anchored to their exact phase at the
+    # start of every block of samples so that rounding errors cannot build
+    # up over long windows, and a block of output stays in cache while all
+    # sinusoids are added to it.
+    t0 = 0
+    while t0 < n:
+        stop = min(t0 + BLOCK, n)
+        for k in range(n_sin):
+            z[0, k] = mag[k] * cos(omega[k] * t0 + phase[k])
+            z[1, k] = mag[k] * sin(omega[k] * t0 + phase[k])
+        for t in range(t0, stop):
+            s = out[t]
+            for k in range(n_sin):
+                re = z[0, k]
+                im = z[1, k]
+                s = s + re
+                z[0, k] = re * z[2, k] - im * z[3, k]
+                z[1, k] = re * z[3, k] + im * z[2, k]
+            out[t] = s
+        t0 = stop
+
+cpdef void sinusoids(double[::1] mag, double[::1] phase, double[::1] omega,
+                     double[::1] out):
+    cdef double[:, ::1] z = np.empty((4, mag.shape[0]), dtype=np.float64)
+
+    if not mag.shape[0] == phase.shape[0] == omega.shape[0]:
+        raise ValueError("mag, phase and omega must be the same length")
+
+    with nogil:
+        sinusoids1d(mag, phase, omega, z, out)
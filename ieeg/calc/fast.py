@@ -3,8 +3,12 @@ from ieeg.calc._fast.ufuncs import mean_diff as _md
 from ieeg.calc._fast.mixup import mixupnd as cmixup, normnd as cnorm
 from ieeg.calc._fast.permgt import permgtnd as permgt
 from ieeg.calc._fast.concat import nan_concatinate
+from ieeg.calc._fast.sinusoid import sinusoids as _sinusoids
+from ieeg.calc._fast.overlap import overlap_add as _overlap_add
+from ieeg.calc._fast.moments import sq_moments as _sq_moments
 
-__all__ = ["mean_diff", "mixup", "permgt", "norm", "concatenate_arrays"]
+__all__ = ["mean_diff", "mixup", "permgt", "norm", "concatenate_arrays",
+           "sum_sinusoids", "overlap_add", "power_std"]
 
 
 def concatenate_arrays(arrays: tuple[np.ndarray, ...], axis: int = 0
@@ -58,7 +62,10 @@ def concatenate_arrays(arrays: tuple[np.ndarray, ...], axis: int = 0
         axis = 0
         arrays = [np.expand_dims(ar, axis) for ar in arrays]
 
-    arrays = [ar.astype(float) for ar in arrays if ar.size > 0]
+    # the kernel writes every element once, filling only the padding with
+    # nan, so inputs that are already contiguous float64 are not copied
+    arrays = [np.ascontiguousarray(ar, dtype=float) for ar in arrays
+              if ar.size > 0]
 
     while axis < 0:
         axis += max(a.ndim for a in arrays)
@@ -195,3 +202,152 @@ def mean_diff(group1: np.ndarray, group2: np.ndarray,
         in1, in2 = group1, group2
 
     return _md(in1, in2)
+
+
+def sum_sinusoids(freqs: np.ndarray, amps: np.ndarray, sfreq: float,
+                  n_times: int, out: np.ndarray = None) -> np.ndarray:
+    """Reconstruct the sum of sinusoids with given complex amplitudes.
+
+    Computes :math:`\\sum_k |a_k| \\cos(2 \\pi f_k t / f_s + \\angle a_k)`
+    for every sample :math:`t` in a single pass over the output, without
+    allocating a temporary array per sinusoid.
+
+    Parameters
+    ----------
+    freqs : array, shape (n_sinusoids,)
+        The frequencies of the sinusoids in Hz.
+    amps : array, shape (n_sinusoids,)
+        The complex amplitudes of the sinusoids.
+    sfreq : float
+        The sampling frequency in Hz.
+    n_times : int
+        The number of samples to reconstruct.
+    out : array, shape (n_times,), optional
+        A C-contiguous float64 array to add the sinusoids to in place. If
+        None, a new array is allocated.
+
+    Returns
+    -------
+    array, shape (n_times,)
+        The summed sinusoids.
+
+    Examples
+    --------
+    >>> sum_sinusoids(np.array([1.]), np.array([2 + 0j]), 4., 5)
+    array([ 2.0000000e+00,  1.2246468e-16, -2.0000000e+00, -3.6739404e-16,
+            2.0000000e+00])
+    >>> sum_sinusoids(np.array([1., 2.]), np.array([1j, 1.]), 8., 4)
+    array([ 1.        , -0.70710678, -2.        , -0.70710678])
+    >>> x = np.ones(4)
+    >>> sum_sinusoids(np.array([2.]), np.array([-1.]), 8., 4, out=x)
+    array([0., 1., 2., 1.])
+    """
+    amps = np.asarray(amps, dtype=np.complex128)
+    mag = np.ascontiguousarray(np.abs(amps), dtype=np.float64)
+    phase = np.ascontiguousarray(np.angle(amps), dtype=np.float64)
+    omega = np.ascontiguousarray(2 * np.pi * np.asarray(freqs) / sfreq,
+                                 dtype=np.float64)
+    if out is None:
+        out = np.zeros(n_times, dtype=np.float64)
+    elif out.shape != (n_times,):
+        raise ValueError(f"out must have shape ({n_times},), got {out.shape}")
+    _sinusoids(mag, phase, omega, out)
+    return out
+
+
+def overlap_add(chunks: np.ndarray, window: np.ndarray, out: np.ndarray,
+                start: int, step: int) -> np.ndarray:
+    """Window equally spaced chunks and add them into an output array.
+
+    Chunk ``w`` is multiplied by the window and added in place to
+    ``out[start + w * step:start + w * step + n_samples]``.
+
+    Parameters
+    ----------
+    chunks : array, shape (n_windows, n_samples)
+        The chunks to add. They may be a strided view, such as overlapping
+        windows of a signal, and are not copied.
+    window : array, shape (n_samples,)
+        The window applied to every chunk.
+    out : array, shape (n_times,)
+        The C-contiguous float64 array to accumulate into.
+    start : int
+        The sample at which the first chunk begins.
+    step : int
+        The number of samples between the starts of consecutive chunks.
+
+    Returns
+    -------
+    out : array, shape (n_times,)
+        The output array.
+
+    Examples
+    --------
+    >>> out = np.zeros(6)
+    >>> overlap_add(np.ones((2, 4)), np.array([.5, 1., 1., .5]), out, 1, 1)
+    array([0. , 0.5, 1.5, 2. , 1.5, 0.5])
+    """
+    _overlap_add(np.asarray(chunks, dtype=np.float64),
+                 np.ascontiguousarray(window, dtype=np.float64), out, start,
+                 step)
+    return out
+
+
+def power_std(data: np.ndarray, axis: int = 0) -> np.ndarray:
+    """Standard deviation of the squared data for each index along an axis.
+
+    Equivalent to ``np.std(np.square(data), axes)`` over all other axes,
+    with squares that are exactly zero replaced by 1e-9. The squares are
+    never stored, and float32 or float64 data is read through its own strides,
+    so no converted or contiguous copy is made. Other dtypes are converted to
+    float64 first.
+
+    Parameters
+    ----------
+    data : array
+        The data, e.g. (trials, channels, time).
+    axis : int
+        The axis to keep, e.g. the channel axis.
+
+    Returns
+    -------
+    array, shape (data.shape[axis],)
+        The standard deviation of the power of each index along axis.
+
+    Examples
+    --------
+    >>> data = np.array([[1., 2.], [0., 3.], [1., -1.]])
+    >>> power_std(data, axis=0)
+    array([1.5, 4.5, 0. ])
+    >>> np.std(np.square(data), 1)
+    array([1.5, 4.5, 0. ])
+    >>> power_std(data, axis=1)
+    array([0.47140452, 3.29983165])
+    """
+    arr = np.moveaxis(np.asarray(data), axis, 0)
+    if arr.dtype not in (np.float32, np.float64):
+        arr = arr.astype(np.float64)
+    # the kernel reduces the last two axes, so give smaller inputs unit axes,
+    # which is always a view
+    arr = arr.reshape(arr.shape[:1] + (1,) * (3 - arr.ndim) + arr.shape[1:])
+    if 0 in arr.shape[1:]:
+        raise ValueError("data must have at least one sample per row")
+    if arr.ndim == 3:
+        mean, m2 = _sq_moments(arr)
+        return np.sqrt(m2 / (arr.shape[1] * arr.shape[2]))
+
+    # reduce one view at a time over any remaining axes and merge the
+    # moments with the pairwise update of Chan et al., which stays exact
+    count = 0
+    size = arr.shape[-2] * arr.shape[-1]
+    for idx in np.ndindex(arr.shape[1:-2]):
+        m, s = _sq_moments(arr[(slice(None),) + idx])
+        if count == 0:
+            mean, m2 = m, s
+        else:
+            delta = m - mean
+            total = count + size
+            mean += delta * (size / total)
+            m2 += s + delta ** 2 * (count * size / total)
+        count += size
+    return np.sqrt(m2 / count)
@@ -1400,21 +1400,16 @@ def get_elbow(data: np.ndarray) -> int:
     >>> get_elbow(data)
     4
     """
+    data = np.asarray(data)
     nPoints = len(data)
-    allCoord = np.vstack((range(nPoints), data)).T
-    firstPoint = allCoord[0]
-    lineVec = allCoord[-1] - allCoord[0]
-    lineVecNorm = lineVec / np.sqrt(np.sum(lineVec ** 2))
-    vecFromFirst = allCoord - firstPoint
-    scalarProduct = np.sum(vecFromFirst * np.tile(lineVecNorm,
-                                                  (nPoints, 1)), axis=1)
-    vecFromFirstParallel = np.outer(scalarProduct, lineVecNorm)
-    vecToLine = vecFromFirst - vecFromFirstParallel
-    distToLine = np.sqrt(np.sum(vecToLine ** 2, axis=1))
+    # the signed distance of each point above the line is proportional to
+    # the cross product of the line with the vector from the first point,
+    # so neither the distances nor the normalized line are needed for argmax
+    rise = data[-1] - data[0]
+    dist = (data - data[0]) * (nPoints - 1) - np.arange(nPoints) * rise
     # set distance to points below lineVec to 0
-    distToLine[vecToLine[:, 1] < 0] = 0
-    idxOfBestPoint = np.argmax(distToLine)
-    return idxOfBestPoint
+    np.maximum(dist, 0, out=dist)
+    return int(np.argmax(dist))
 
 
 def events_in_order(inst: mne.BaseEpochs) -> list[str]:
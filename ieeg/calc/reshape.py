@@ -28,6 +28,7 @@ def stitch_mats(mats: list[np.ndarray], overlaps: list[int], axis: int = 0
     >>> mat3 = np.array([[13, 14, 15], [16, 17, 18]])
     >>> stitch_mats([mat1, mat2, mat3], [1, 1])
     array([[ 1,  2,  3],
+           [ 4,  5,  6],
            [10, 11, 12],
            [16, 17, 18]])
     >>> stitch_mats([mat1, mat2, mat3], [0, 0], axis=1)
@@ -37,31 +38,69 @@ def stitch_mats(mats: list[np.ndarray], overlaps: list[int], axis: int = 0
     >>> stitch_mats([mat3, mat4], [0], axis=1)
     array([[13., 14., 15., 19., 20., 21.],
            [16., 17., 18., 22., 23., nan]])
+    >>> stitch_mats([mat1, mat1 + 1], [3], axis=1)
+    array([[1. , 2.5, 4. ],
+           [4. , 5.5, 7. ]])
     """
-    stitches = [mats[0]]
     if len(mats) != len(overlaps) + 1:
         raise ValueError("The number of matrices must be one more than the num"
                          "ber of overlaps")
-    for i, over in enumerate(overlaps):
-        stitches = stitches[:-2] + merge(stitches[-1], mats[i + 1], over, axis)
-    out = np.concatenate(stitches, axis=axis)
-    if np.array_equal(out.astype(int), out):
-        return out.astype(int)
+
+    # allocate the stitched matrix once and write every block into it
+    shape = list(mats[0].shape)
+    shape[axis] = sum(mat.shape[axis] for mat in mats) - sum(overlaps)
+    out = np.empty(shape, dtype=np.result_type(*mats, float))
+    sl = [slice(None)] * out.ndim
+
+    def _seg(start: int, stop: int) -> tuple[slice, ...]:
+        sl[axis] = slice(start, stop)
+        return tuple(sl)
+
+    rest = mats[0]
+    cursor = 0
+    middles = []
+    for over, mat in zip(overlaps, mats[1:]):
+        n = rest.shape[axis] - over
+        start, middle, rest = merge(rest, mat, over, axis, out=out[_seg(
+            cursor + n, cursor + n + over)])
+        out[_seg(cursor, cursor + n)] = start
+        middles.append(middle)
+        cursor += n + over
+    out[_seg(cursor, shape[axis])] = rest
+
+    # integer inputs stay integers unless the crossfades made fractions
+    if all(np.issubdtype(mat.dtype, np.integer) for mat in mats) and all(
+            np.array_equal(np.trunc(m), m) for m in middles):
+        return out.astype(np.result_type(*mats))
     else:
         return out
 
 
-def merge(mat1: np.ndarray, mat2: np.ndarray, overlap: int, axis: int = 0
-          ) -> list[np.ndarray[float]]:
-    """Take two arrays and merge them over the overlap gradually"""
+def merge(mat1: np.ndarray, mat2: np.ndarray, overlap: int, axis: int = 0,
+          out: np.ndarray = None) -> list[np.ndarray[float]]:
+    """Take two arrays and merge them over the overlap gradually
+
+    Examples
+    --------
+    >>> mat1 = np.array([[1., 2.], [3., 4.], [5., 6.]])
+    >>> mat2 = np.array([[7., 8.], [9., 10.], [11., 12.]])
+    >>> start, middle, last = merge(mat1, mat2, 2)
+    >>> middle
+    array([[ 3.,  4.],
+           [ 9., 10.]])
+    """
     sl = [slice(None)] * mat1.ndim
     sl[axis] = slice(0, mat1.shape[axis] - overlap)
     start = mat1[tuple(sl)]
+
+    # crossfade weights along the merge axis
+    w_shape = [1] * mat1.ndim
+    w_shape[axis] = overlap
     sl[axis] = slice(mat1.shape[axis] - overlap, mat1.shape[axis])
-    middle1 = np.multiply(np.linspace(1, 0, overlap), mat1[tuple(sl)])
+    middle = np.multiply(mat1[tuple(sl)],
+                         np.linspace(1, 0, overlap).reshape(w_shape), out=out)
     sl[axis] = slice(0, overlap)
-    middle2 = np.multiply(np.linspace(0, 1, overlap), mat2[tuple(sl)])
-    middle = np.add(middle1, middle2)
+    middle += mat2[tuple(sl)] * np.linspace(0, 1, overlap).reshape(w_shape)
     sl[axis] = slice(overlap, mat2.shape[axis])
     last = mat2[tuple(sl)]
 
@@ -116,7 +155,9 @@ def make_data_same(data_fix: np.ndarray, shape: tuple | list,
     # Check if the pad dimension of data_fix is smaller than the pad
     # dimension of shape
     if data_fix.shape[pad_ax] <= shape[pad_ax]:
-        return pad_to_match(np.zeros(shape), data_fix, stack_ax)
+        # only the shape of the target is needed, so don't allocate it
+        like = np.broadcast_to(np.empty((), dtype=data_fix.dtype), shape)
+        return pad_to_match(like, data_fix, stack_ax)
 
     # When the pad dimension of data_fix is larger than the pad dimension of
     # shape, take subsets of data_fix and stack them together on the stack
@@ -147,6 +188,14 @@ def pad_to_match(sig1: np.ndarray, sig2: np.ndarray,
     -------
     sig2 : array
         The padded data.
+
+    Examples
+    --------
+    >>> sig1 = np.zeros((2, 6))
+    >>> sig2 = np.array([[1, 2, 3, 4], [5, 6, 7, 8]])
+    >>> pad_to_match(sig1, sig2)
+    array([[1, 2, 3, 4, 3, 2],
+           [5, 6, 7, 8, 7, 6]])
     """
     # Make sure the data is the same shape
     if np.isscalar(axis):
@@ -162,7 +211,25 @@ def pad_to_match(sig1: np.ndarray, sig2: np.ndarray,
         pad_shape = [(0, 0) if eq[i] else
                      (0, sig1.shape[i] - sig2.shape[i])
                      for i in range(sig1.ndim)]
-        sig2 = np.pad(sig2, pad_shape, mode='reflect')
+        padded = [i for i, e in enumerate(eq) if not e]
+        n = sig2.shape[padded[0]]
+        deficit = pad_shape[padded[0]][1]
+        if len(padded) == 1 and 0 < deficit < n:
+            # a single reflection along one axis is just a reversed slice
+            ax = padded[0]
+            shape = list(sig2.shape)
+            shape[ax] += deficit
+            out = np.empty(shape, dtype=sig2.dtype)
+            sl = [slice(None)] * sig2.ndim
+            sl[ax] = slice(None, n)
+            out[tuple(sl)] = sig2
+            tail = sl.copy()
+            tail[ax] = slice(n - 1 - deficit, n - 1)
+            sl[ax] = slice(n, None)
+            out[tuple(sl)] = np.flip(sig2[tuple(tail)], axis=ax)
+            sig2 = out
+        else:
+            sig2 = np.pad(sig2, pad_shape, mode='reflect')
     return sig2
 
 
@@ -226,25 +293,21 @@ def rand_offset_reshape(data_fix: np.ndarray, shape: tuple, stack_ax: int,
     offset = np.random.randint(0, data_fix.shape[pad_ax] - shape[
         pad_ax] * num_stack)
 
-    # Create an array to store the output
+    # Split the trimmed pad axis into (num_stack, subset) as a view, and move
+    # the subsets next to the stack axis so that subset i of stack index j
+    # lands at j * num_stack + i
+    sl = [slice(None)] * data_fix.ndim
+    sl[pad_ax] = slice(offset, offset + shape[pad_ax] * num_stack)
+    trimmed = data_fix[tuple(sl)]
+    split = trimmed.reshape(trimmed.shape[:pad_ax] + (
+        num_stack, shape[pad_ax]) + trimmed.shape[pad_ax + 1:])
+    subsets = np.moveaxis(split, pad_ax, stack_ax + 1)
+
+    # Copy the subsets into the output in a single pass
     out_shape = [shape[i] if i == pad_ax else data_fix.shape[i]
                  for i in range(data_fix.ndim)]
     out_shape[stack_ax] *= num_stack
-    out = np.zeros(tuple(out_shape), dtype=data_fix.dtype)
-
-    # Iterate over the subsets
-    sl_in = [slice(None)] * data_fix.ndim
-    sl_out = [slice(None)] * data_fix.ndim
-    for i in range(num_stack):
-        # Get the start and end indices of the subset
-        start = i * shape[pad_ax] + offset
-        end = start + shape[pad_ax]
-
-        # Create a slice object for the subset
-        sl_in[pad_ax] = slice(start, end)
-        sl_out[stack_ax] = slice(i, None, num_stack)
-
-        # Fill in the subset
-        out[tuple(sl_out)] = data_fix[tuple(sl_in)]
+    out = np.empty(tuple(out_shape), dtype=data_fix.dtype)
+    np.copyto(out.reshape(subsets.shape), subsets)
 
     return out
@@ -6,7 +6,7 @@ from scipy import ndimage
 
 from ieeg import Doubles
 from ieeg.calc.reshape import make_data_same
-from ieeg.calc.fast import mean_diff, permgt as permgtnd
+from ieeg.calc.fast import mean_diff, permgt as permgtnd, power_std
 from ieeg.process import get_mem, iterate_axes
 
 
@@ -101,30 +101,27 @@ def outlier_repeat(data: np.ndarray, sd: float, rounds: int = np.inf,
     >>> tuple(outlier_repeat(data, 1, rounds=0))
     ()
     """
-    inds = list(range(data.shape[axis]))
+    inds = np.arange(data.shape[axis])
 
-    # Square the data and set zeros to small positive number
-    R2 = np.square(data)
-    R2[np.where(R2 == 0)] = 1e-9
-
-    # find all axes that are not channels (example: time, trials)
-    axes = tuple(i for i in range(data.ndim) if not i == axis)
-
-    # Initialize stats loop
-    sig = np.std(R2, axes)  # take standard deviation of each channel
+    # Initialize stats loop with the standard deviation of each channel's
+    # power (zeros are set to a small positive number), computed in a single
+    # compiled loop without storing the squared data
+    sig = power_std(data, axis)
     cutoff = (sd * np.std(sig)) + np.mean(sig)  # outlier cutoff
     i = 1
 
     # remove bad channels and re-calculate variance until no outliers are left
-    while np.any(np.where(sig > cutoff)) and i <= rounds:
+    while np.any(out := sig > cutoff) and i <= rounds:
 
-        # Pop out names to bads output using comprehension list
-        for j, out in enumerate(np.where(sig > cutoff)[0]):
-            yield inds.pop(out - j), i
+        # yield the original index of each outlier, in order
+        for ind in inds[out].tolist():
+            yield ind, i
 
-        # re-calculate per channel variance
-        R2 = R2[..., np.where(sig < cutoff)[0], :]
-        sig = np.std(R2, axes)
+        # each channel's variance does not depend on the others, so only the
+        # cutoff has to be re-calculated from the remaining channels
+        keep = ~out
+        inds = inds[keep]
+        sig = sig[keep]
         cutoff = (sd * np.std(sig)) + np.mean(sig)
         i += 1
 
@@ -850,8 +847,8 @@ def sum_squared(x: np.ndarray) -> np.ndarray | float:
     return np.dot(x_flat, x_flat)
 
 
-def sine_f_test(window_fun: np.ndarray, x_p: np.ndarray
-                ) -> (np.ndarray, np.ndarray):
+def sine_f_test(window_fun: np.ndarray, x_p: np.ndarray,
+                freq_mask: np.ndarray = None) -> (np.ndarray, np.ndarray):
     """Computes the F-statistic for sine wave in locally-white noise.
 
     This function computes the F-statistic for a sine wave in locally-white
@@ -876,6 +873,9 @@ def sine_f_test(window_fun: np.ndarray, x_p: np.ndarray
         The tapers used to calculate the multitaper spectrum.
     x_p : array
         The tapered time series.
+    freq_mask : array of bool | slice, optional
+        Only evaluate the frequency bins where this mask is True, or the bins
+        within this slice. The outputs then only contain the selected bins.
 
     Returns
     -------
@@ -900,8 +900,13 @@ def sine_f_test(window_fun: np.ndarray, x_p: np.ndarray
            [1., 1.],
            [1., 1.],
            [1., 1.]]))
-
+    >>> f_stat, A = sine_f_test(window_fun, x_p, np.array([True, False]))
+    >>> f_stat.ravel()
+    array([0.        , 0.00027778, 0.        , 0.01      , 0.        ])
     """
+    if freq_mask is not None:
+        x_p = x_p[..., freq_mask]
+
     # drop the even tapers
     n_tapers = len(window_fun)
     tapers_odd = np.arange(0, n_tapers, 2)
@@ -923,8 +928,8 @@ def sine_f_test(window_fun: np.ndarray, x_p: np.ndarray
 
     # figure out which freqs to remove using F stat
 
-    # estimated coefficient
-    x_hat = A * np.reshape(H0, (-1, 1))
+    # estimated coefficient (n_ch, n_tapers, n_freqs)
+    x_hat = A[:, np.newaxis, :] * exp_H0
 
     # numerator for F-statistic
     num = (n_tapers - 1) * (A * A.conj()).real * H0_sq
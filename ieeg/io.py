@@ -1,12 +1,15 @@
+import mmap
 import re
-from functools import singledispatch
-from os import scandir, mkdir, path as op, walk
+from copy import deepcopy
+from functools import lru_cache, singledispatch
+from os import scandir, mkdir, stat, path as op
 
 import mne
 import numpy as np
 import pandas as pd
 from bids import BIDSLayout
 from bids.layout import BIDSFile, parse_file_entities
+from joblib import Parallel, delayed, effective_n_jobs
 from mne.utils import fill_doc, verbose
 from mne_bids import BIDSPath, get_bids_path_from_fname, mark_channels, \
     read_raw_bids, write_raw_bids
@@ -15,6 +18,13 @@ from mne_bids.write import _from_tsv
 from ieeg import PathLike, Signal
 
 
+# scale from each supported unit of the .dat samples to volts
+_UNIT_FACTORS = {"V": 1., "mV": 1e-3, "uV": 1e-6, "nV": 1e-9}
+
+# folders that never hold the raw .dat recordings
+_SKIP_DIRS = frozenset(('derivatives', 'sourcedata'))
+
+
 def find_dat(folder: PathLike) -> (PathLike, PathLike):
     """Looks for the .dat file in a specified folder
 
@@ -30,14 +40,20 @@ def find_dat(folder: PathLike) -> (PathLike, PathLike):
     """
     cleanieeg = None
     ieeg = None
-    for root, _, files in walk(folder):
-        for file in files:
-            if re.match(r".*cleanieeg\.dat.*", file):
-                cleanieeg: PathLike = op.join(root, file)
-            elif re.match(r".*ieeg\.dat.*", file):
-                ieeg: PathLike = op.join(root, file)
-            if ieeg is not None and cleanieeg is not None:
-                return ieeg, cleanieeg
+    stack = [folder]
+    while stack:
+        with scandir(stack.pop()) as entries:
+            for entry in entries:
+                name = entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if not (name in _SKIP_DIRS or name.startswith('.')):
+                        stack.append(entry.path)
+                elif "cleanieeg.dat" in name:
+                    cleanieeg: PathLike = entry.path
+                elif "ieeg.dat" in name:
+                    ieeg: PathLike = entry.path
+                if ieeg is not None and cleanieeg is not None:
+                    return ieeg, cleanieeg
     raise FileNotFoundError("Not all .dat files were found:")
 
 
@@ -74,7 +90,8 @@ def bidspath_from_layout(layout: BIDSLayout, **kwargs) -> BIDSPath:
 
 @fill_doc
 def raw_from_layout(layout: BIDSLayout, preload: bool = True,
-                    run: list[int] | int = None, **kwargs) -> mne.io.Raw:
+                    run: list[int] | int = None, *, n_jobs: int = 1,
+                    **kwargs) -> mne.io.Raw:
     """Searches a BIDSLayout for a raw file and returns a mne Raw object.
 
     Parameters
@@ -84,6 +101,11 @@ def raw_from_layout(layout: BIDSLayout, preload: bool = True,
     %(preload)s
     run : Union[List[int], int], optional
         The run to search for, by default None
+    n_jobs : int, optional
+        The number of threads used to read runs concurrently. By default 1,
+        which reads the runs one after another. Concurrent reads are opt-in,
+        e.g. -1 uses one thread per run up to the number of cores, and share
+        MNE's logging between the threads.
     **kwargs : dict
         The parameters passed to bids.BIDSLayout.get()
 
@@ -106,12 +128,14 @@ def raw_from_layout(layout: BIDSLayout, preload: bool = True,
         runs = layout.get(return_type="id", target="run", **kwargs)
     else:
         runs = list(run)
-    raw: list[mne.io.Raw] = []
     if runs:
-        for r in runs:
-            BIDS_path = bidspath_from_layout(layout, run=r, **kwargs)
-            new_raw = read_raw_bids(bids_path=BIDS_path, verbose=verbose)
-            raw.append(new_raw.copy())
+        # the layout is queried serially since its database session is not
+        # thread safe, then the independent run files are read in threads
+        paths = [bidspath_from_layout(layout, run=r, **kwargs) for r in runs]
+        n_jobs = min(len(paths), effective_n_jobs(n_jobs))
+        raw: list[mne.io.Raw] = Parallel(n_jobs, prefer='threads')(
+            delayed(read_raw_bids)(bids_path=p, verbose=verbose)
+            for p in paths)
         whole_raw: mne.io.Raw = mne.concatenate_raws(raw)
     else:
         BIDS_path = bidspath_from_layout(layout, **kwargs)
@@ -122,7 +146,8 @@ def raw_from_layout(layout: BIDSLayout, preload: bool = True,
 
 
 def open_dat_file(file_path: str, channels: list[str], sfreq: int = 2048,
-                  types: str = "seeg", units: str = "uV") -> mne.io.RawArray:
+                  types: str = "seeg", units: str = "uV",
+                  preload: str | None = None) -> mne.io.RawArray:
     """Opens a .dat file and returns a mne.io.RawArray object.
 
     Parameters
@@ -137,34 +162,63 @@ def open_dat_file(file_path: str, channels: list[str], sfreq: int = 2048,
         The channel types, by default "seeg"
     units : str, optional
         The units of the data, by default "uV"
+    preload : str | None, optional
+        If a string, the scaled data are written to a memory-mapped file at
+        that path instead of being held in memory, as with ``preload`` in
+        :func:`mne.io.read_raw`. By default None, which holds the data in
+        memory. The data are always loaded, so booleans are not accepted.
 
     Returns
     -------
     mne.io.RawArray
     """
-    with open(file_path, mode='rb') as f:
-        data = np.fromfile(f, dtype="float32")
+    if not (preload is None or isinstance(preload, str)):
+        raise TypeError(f"preload must be a file path or None, not {preload}")
+    try:
+        factor = _UNIT_FACTORS[units]
+    except KeyError:
+        raise NotImplementedError("Unit " + units + " not implemented yet")
     if "Trigger" in channels:
         channels.remove("Trigger")
+    # map the file rather than reading it, so the only copy in memory is the
+    # float64 array made by RawArray. The whole file is about to be read in
+    # order, so the kernel is asked to start reading ahead right away.
+    with open(file_path, mode='rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, 'MADV_WILLNEED'):  # not available on Windows
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+        mm.madvise(mmap.MADV_WILLNEED)
+    data = np.frombuffer(mm, dtype="float32")
     array = np.reshape(data, [len(channels), -1], order='F')
-    match units:
-        case "V":
-            factor = 1
-        case "mV":
-            factor = 1e-3
-        case "uV":
-            factor = 1e-6
-        case "nV":
-            factor = 1e-9
-        case _:
-            raise NotImplementedError("Unit " + units + " not implemented yet")
     info = mne.create_info(channels, sfreq, types)
-    raw = mne.io.RawArray(array * factor, info)
+    # scale while converting to float64 so RawArray can use it without a copy
+    if preload is not None:
+        scaled = np.memmap(preload, dtype=np.float64, mode='w+',
+                           shape=array.shape)
+    else:
+        scaled = np.empty(array.shape, dtype=np.float64)
+    _scale_into(array, factor, scaled)
+    raw = mne.io.RawArray(scaled, info)
     return raw
 
 
-def get_data(task: str, root: PathLike,
-             prefix: str = r"BIDS-\d\.\d_") -> BIDSLayout:
+def _scale_into(array: np.ndarray, factor: float, out: np.ndarray,
+                block_bytes: int = 100 * 2 ** 20) -> None:
+    """Scale an array into ``out`` one block of samples at a time.
+
+    Each block of about ``block_bytes`` of output is written before the next
+    is read, so the pages of a memory-mapped input or output can be released
+    as the copy moves through the file.
+    """
+    step = max(1, block_bytes // (out.itemsize * array.shape[0]))
+    for start in range(0, array.shape[1], step):
+        sl = slice(start, start + step)
+        np.multiply(array[:, sl], factor, out=out[:, sl])
+
+
+def get_data(task: str, root: PathLike, prefix: str = r"BIDS-\d\.\d_",
+             database_path: PathLike = None, reset_database: bool = False
+             ) -> BIDSLayout:
     """Gets the data for a subject and task.
 
     Parameters
@@ -175,6 +229,13 @@ def get_data(task: str, root: PathLike,
         The path to the lab directory, by default LAB_root
     prefix : str, optional
         The prefix of the BIDS directory, by default 'BIDS'
+    database_path : PathLike, optional
+        A writable location to save the pybids index to, so that later calls
+        load it instead of re-indexing every file. By default None, which
+        indexes the dataset every time and writes nothing.
+    reset_database : bool, optional
+        Whether to rebuild the saved index, e.g. after adding subjects, by
+        default False
 
     Returns
     -------
@@ -190,11 +251,32 @@ def get_data(task: str, root: PathLike,
     >>> get_data('epilepsy-ecog-data', parent, "MNE-") # doctest: +ELLIPSIS
     BIDS Layout: ... | Subjects: 1 | Sessions: 1 | Runs: 0
     """
+    # a new BIDS directory changes the modification time of the lab
+    # directory, so it is part of the key of the cached lookup
+    root = op.abspath(root)
+    BIDS_root = _find_bids_root(root, prefix, task, stat(root).st_mtime_ns)
+
+    # check for BIDS subfolder
+    if op.isdir(alt_root := op.join(BIDS_root, "BIDS")):
+        BIDS_root = alt_root
+
+    reset_database = reset_database and database_path is not None
+    return BIDSLayout(BIDS_root, derivatives=True, database_path=database_path,
+                      reset_database=reset_database)
+
+
+@lru_cache(maxsize=32)
+def _find_bids_root(root: str, prefix: str, task: str, mtime: int) -> str:
+    """Find the latest BIDS directory for a task in the lab directory.
+
+    ``mtime`` is only used to key the cache on the state of ``root``.
+    """
     # scan data directory
     scan = scandir(root)
 
     # keep only matching BIDS directories
-    matches = filter(lambda x: re.match(prefix + task, x.name), scan)
+    pattern = _bids_task_re(prefix, task)
+    matches = filter(lambda x: pattern.match(x.name), scan)
 
     # check that there is at least one match
     ordered = sorted(matches, key=lambda x: x.name)
@@ -202,13 +284,13 @@ def get_data(task: str, root: PathLike,
         "Could not find BIDS directory in {} for task {}".format(root, task))
 
     # grab the last match
-    BIDS_root = op.join(root, ordered[-1].name)
+    return op.join(root, ordered[-1].name)
 
-    # check for BIDS subfolder
-    if op.isdir(alt_root := op.join(BIDS_root, "BIDS")):
-        return BIDSLayout(alt_root, derivatives=True)
-    else:
-        return BIDSLayout(BIDS_root, derivatives=True)
+
+@lru_cache(maxsize=32)
+def _bids_task_re(prefix: str, task: str) -> re.Pattern:
+    """Compile the pattern matching BIDS directory names for a task."""
+    return re.compile(prefix + task)
 
 
 @fill_doc
@@ -253,8 +335,8 @@ def save_derivative(inst: Signal, layout: BIDSLayout, pipeline: str = None,
         bids_path = BIDSPath(**entities, root=save_dir)
 
         # account for cropping
-        run = inst.copy().crop(tmin=bounds[i] - inst.first_time,
-                               tmax=bounds[i + 1] - inst.first_time)
+        run = _crop_copy(inst, tmin=bounds[i] - inst.first_time,
+                         tmax=bounds[i + 1] - inst.first_time)
         if anonymize:
             if isinstance(run, Signal):
                 run.anonymize()
@@ -269,6 +351,16 @@ def save_derivative(inst: Signal, layout: BIDSLayout, pipeline: str = None,
                        anonymize=anonymize, verbose=verbose)
 
 
+def _crop_copy(inst: Signal, tmin: float, tmax: float) -> Signal:
+    """Copy a cropped section of an instance.
+
+    The data buffer is shared with the original while the metadata is copied,
+    so only the cropped section of the data is duplicated by ``crop``.
+    """
+    data = getattr(inst, '_data', None)
+    return deepcopy(inst, {id(data): data}).crop(tmin=tmin, tmax=tmax)
+
+
 def get_bad_chans(fname: str):
     """Gets the bad channels corresponding to a file.
 
@@ -1,12 +1,14 @@
 import argparse
+from functools import partial
 from typing import Union
 
 import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
 from mne.io import pick
 from mne.utils import fill_doc, logger, verbose
+from scipy import signal
 
 from ieeg import ListNum
-from ieeg.process import proc_array
 from ieeg.timefreq import utils as mt_utils
 from ieeg.timefreq.multitaper import WindowingRemover
 
@@ -18,7 +20,9 @@ def line_filter(raw: mt_utils.Signal, fs: float = None, freqs: ListNum = 60.,
                 mt_bandwidth: float = None, p_value: float = 0.05,
                 picks: list[Union[int, str]] = None, n_jobs: int = None,
                 adaptive: bool = True, low_bias: bool = True,
-                copy: bool = True, *, verbose: Union[int, bool, str] = None
+                copy: bool = True, precision: str = 'float64',
+                method: str = 'spectrum_fit', *,
+                verbose: Union[int, bool, str] = None
                 ) -> mt_utils.Signal:
     """Apply a multitaper line noise notch filter for the signal instance.
 
@@ -40,7 +44,7 @@ def line_filter(raw: mt_utils.Signal, fs: float = None, freqs: ListNum = 60.,
         Sampling rate in Hz. Default is taken from the raw object.
     freqs : float | array-like of float, optional
         Frequencies to notch filter in Hz, e.g. np.arange(60, 241, 60).
-        None can only be used with the mode 'spectrum_fit', where an F
+        None can only be used with the method 'spectrum_fit', where an F
         test is used to find sinusoidal components.
     filter_length : str | int, optional
         Length of the filter to use. If str, assumed to be human-readable time
@@ -68,6 +72,16 @@ def line_filter(raw: mt_utils.Signal, fs: float = None, freqs: ListNum = 60.,
     copy : bool, optional
         If True, a copy of x, filtered, is returned. Otherwise, it operates
         on x in place.
+    precision : str, optional
+        Floating point precision of the multitaper spectra, 'float64' or
+        'float32'. Single precision halves the memory traffic of the spectral
+        estimation on long recordings. Default is 'float64'.
+    method : str, optional
+        'spectrum_fit' (the default) removes the sinusoids found by the
+        multitaper F-test. 'iir' instead applies a zero-phase cascade of IIR
+        notch filters at each of freqs, each with a -3 dB bandwidth of its
+        notch width. This is much faster when the line frequencies are known,
+        and the multitaper parameters are then ignored.
     %(verbose)s
 
     Returns
@@ -124,8 +138,9 @@ def line_filter(raw: mt_utils.Signal, fs: float = None, freqs: ListNum = 60.,
     else:
         filt = raw
 
-    x = filt.get_data("data")
-    x = mt_utils._check_filterable(x, 'notch filtered', 'notch_filter')
+    # operate on the instance's own buffer to avoid copying the recording
+    x = mt_utils._check_filterable(filt._data, 'notch filtered',
+                                   'notch_filter')
     if freqs is not None:
         freqs = np.atleast_1d(freqs)
         # Only have to deal with notch_widths for non-autodetect
@@ -141,8 +156,21 @@ def line_filter(raw: mt_utils.Signal, fs: float = None, freqs: ListNum = 60.,
                 raise ValueError('notch_widths must be None, scalar, or the '
                                  'same length as freqs')
 
-    data_idx = np.where([ch_t in set(raw.get_channel_types(
-        only_data_chs=True)) for ch_t in raw.get_channel_types()])[0]
+    data_idx = pick._picks_to_idx(raw.info, 'data', exclude=())
+    # picks are given relative to the data channels
+    picks = data_idx[pick._picks_to_idx(len(data_idx), picks)]
+
+    if method == 'iir':
+        if freqs is None:
+            raise ValueError("freqs must be given when method is 'iir'")
+        sos = np.vstack([signal.tf2sos(*signal.iirnotch(f, f / w, fs))
+                         for f, w in zip(freqs, notch_widths)])
+        filt._data = mt_spectrum_proc(x, partial(_iir_notch, sos=sos), picks,
+                                      n_jobs)
+        return filt
+    elif method != 'spectrum_fit':
+        raise ValueError("method must be 'spectrum_fit' or 'iir', got "
+                         f"{method}")
 
     # convert filter length to samples
     if filter_length is None:
@@ -152,23 +180,51 @@ def line_filter(raw: mt_utils.Signal, fs: float = None, freqs: ListNum = 60.,
                              x.shape[-1])
 
     process = WindowingRemover(fs, freqs, notch_widths, filter_length,
-                               adaptive, low_bias, mt_bandwidth, p_value)
+                               adaptive, low_bias, mt_bandwidth, p_value,
+                               precision)
+    process.prepare(x.shape[-1])
 
-    filt._data[data_idx] = mt_spectrum_proc(x, process, picks, n_jobs)
+    filt._data = mt_spectrum_proc(x, process, picks, n_jobs)
 
     return filt
 
 
 def mt_spectrum_proc(x: np.ndarray, process: callable, picks: list,
                      n_jobs: int) -> np.ndarray:
-    """Call _mt_spectrum_remove."""
+    """Call _mt_spectrum_remove.
+
+    The picked channels are filtered in place whenever x can be viewed as 2D,
+    so the returned array shares memory with x."""
     # set up array for filtering, reshape to 2D, operate on last axis
     x, orig_shape, picks = _prep_for_filtering(x, picks)
 
-    proc_array(process, x, n_jobs=n_jobs, desc="Channels")
+    # channels are independent, so the picked ones are dispatched to the
+    # parallel pool in blocks, whose windows are cleaned together, and
+    # scattered back into place. Blocks are kept to about 128 MB, so long
+    # recordings still go one channel at a time
+    n_total = effective_n_jobs(n_jobs)
+    per_block = max(1, min(-(-len(picks) // n_total), 2 ** 24 // x.shape[-1]))
+    blocks = [picks[i:i + per_block] for i in range(0, len(picks), per_block)]
+    # runs of adjacent channels are passed as views rather than gathered
+    blocks = [slice(b[0], b[-1] + 1) if np.all(np.diff(b) == 1) else b
+              for b in blocks]
+
+    # jobs left over when there are fewer blocks than jobs go to threading
+    # the windows of each block instead
+    if hasattr(process, 'workers'):
+        process.workers = max(1, n_total // max(1, min(len(blocks), n_total)))
+
+    gen = Parallel(n_jobs, return_as='generator', verbose=40)(
+        delayed(process)(x[block]) for block in blocks)
+    for out, block in zip(gen, blocks):
+        x[block] = out
+
+    return x.reshape(orig_shape)
+
 
-    x.shape = orig_shape
-    return x
+def _iir_notch(x: np.ndarray, sos: np.ndarray) -> np.ndarray:
+    """Apply second-order notch sections forwards and backwards."""
+    return signal.sosfiltfilt(sos, x, axis=-1).astype(x.dtype, copy=False)
 
 
 def _prep_for_filtering(x: np.ndarray, picks: list = None
@@ -178,16 +234,17 @@ def _prep_for_filtering(x: np.ndarray, picks: list = None
     orig_shape = x.shape
     x = np.atleast_2d(x)
     picks = pick._picks_to_idx(x.shape[-2], picks)
-    x.shape = (np.prod(x.shape[:-1]), x.shape[-1])
+    x = x.reshape(-1, x.shape[-1])
     if len(orig_shape) == 3:
         n_epochs, n_channels, n_times = orig_shape
-        offset = np.repeat(np.arange(0, n_channels * n_epochs, n_channels),
-                           len(picks))
-        picks = np.tile(picks, n_epochs) + offset
+        # the picked rows of every epoch, in epoch order
+        picks = (np.arange(0, n_channels * n_epochs, n_channels)[:, None]
+                 + picks).ravel()
     elif len(orig_shape) > 3:
         raise ValueError('picks argument is not supported for data with more'
                          ' than three dimensions')
-    assert all(0 <= pick < x.shape[0] for pick in picks)  # guaranteed by above
+    # guaranteed by above
+    assert picks.size == 0 or 0 <= picks.min() <= picks.max() < x.shape[0]
 
     return x, orig_shape, picks
 
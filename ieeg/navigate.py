@@ -1,6 +1,7 @@
 import mne
 import numpy as np
 from bids import BIDSLayout
+from mne.io import pick
 from mne.utils import fill_doc, verbose
 from scipy.signal import detrend
 
@@ -54,31 +55,21 @@ def crop_empty_data(raw: mne.io.Raw, bound: str = 'boundary',
     start_pad = to_samples(start_pad, raw.info['sfreq']) / raw.info['sfreq']
     end_pad = to_samples(end_pad, raw.info['sfreq']) / raw.info['sfreq']
 
-    # split annotations into blocks
-    annot = raw.annotations.copy()
-    block_idx = [idx + 1 for idx, val in
-                 enumerate(annot) if bound in val['description']]
-    block_annot = [annot[i: j] for i, j in
-                   zip([0] + block_idx, block_idx +
-                       ([len(annot)] if block_idx[-1] != len(annot) else []))]
+    # split annotations into blocks after each boundary event
+    annot = raw.annotations
+    is_bound = np.char.find(annot.description, bound) >= 0
+    blocks = np.split(np.arange(len(annot)), np.flatnonzero(is_bound) + 1)
 
-    for block_an in block_annot:
+    for block in blocks:
         # remove boundary events from annotations
-        no_bound = None
-        for an in block_an:
-            if bound not in an['description']:
-                if no_bound is None:
-                    no_bound = mne.Annotations(**an)
-                else:
-                    an.pop('orig_time')
-                    no_bound.append(**an)
+        block = block[~is_bound[block]]
 
         # Skip if block is all boundary events
-        if no_bound is None:
+        if block.size == 0:
             continue
         # get start and stop time from raw.annotations onset attribute
-        t_min = max(0, no_bound.onset[0] - start_pad)
-        t_max = no_bound.onset[-1] + end_pad
+        t_min = max(0, annot.onset[block[0]] - start_pad)
+        t_max = annot.onset[block[-1]] + end_pad
 
         # create new cropped raw file
         crop_list.append(raw.copy().crop(tmin=t_min, tmax=t_max))
@@ -133,12 +124,13 @@ def channel_outlier_marker(input_raw: Signal, outlier_sd: float = 3,
     outlier round 2 channels: ['AST2', 'RQ2', 'N/A', 'G32', 'AD3', 'PD4']
     """
 
-    names = input_raw.copy().pick('data').ch_names
-    data = detrend(input_raw.get_data('data'))  # channels X time
+    picks = pick._picks_to_idx(input_raw.info, 'data', exclude=())
+    names = [input_raw.ch_names[i] for i in picks]
+    data = detrend(input_raw.get_data(picks))  # channels X time
     bads = []  # output for bad channel names
     desc = []  # output for bad channel descriptions
 
-    # Pop out names to bads output using comprehension list
+    # collect the names of outlier channels in the order they are found
     for ind, i in stats.outlier_repeat(data, outlier_sd, max_rounds, axis):
         bads.append(names[ind])
         desc.append(f'outlier round {i} more than {outlier_sd} SDs above mean')
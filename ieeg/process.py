@@ -359,16 +359,17 @@ def sliding_window(x_data: np.ndarray, labels: np.ndarray,
     array([397.5, 431.5, 467.5, 505.5, 545.5, 587.5, 631.5])
     """
 
-    # make windowing generator
+    # make windowing generator from a read-only view with the windows along
+    # axis and the samples of each window right after it
     axis = x_data.ndim + axis if axis < 0 else axis
-    slices = (slice(start, start + window_size)
-              for start in range(0, x_data.shape[axis] - window_size))
-    idxs = (tuple(slice(None) if i != axis else sl for i in
-                  range(x_data.ndim)) for sl in slices)
+    view = np.moveaxis(np.lib.stride_tricks.sliding_window_view(
+        x_data, window_size, axis=axis), -1, axis + 1)
+    idxs = ((slice(None),) * axis + (start,)
+            for start in range(x_data.shape[axis] - window_size))
 
     # Use joblib to parallelize the computation
     gen = Parallel(n_jobs=n_jobs, return_as='generator', verbose=40)(
-        delayed(scorer)(x_data[idx], labels, **kwargs) for idx in idxs)
+        delayed(scorer)(view[idx], labels, **kwargs) for idx in idxs)
 
     # initialize output array by running 1 job and get the shape
     mat = next(gen)
@@ -546,17 +547,9 @@ class COLA:
                 self._in_offset >= self.stops[self._idx]:
             start, stop = self.starts[self._idx], self.stops[self._idx]
             this_len = stop - start
-            this_window = self._window.copy()
-            if self._idx == len(self.starts) - 1:
-                this_window = np.pad(
-                    self._window, (0, this_len - len(this_window)), 'constant')
-                for offset in range(self._step, len(this_window), self._step):
-                    n_use = len(this_window) - offset
-                    this_window[offset:] += self._window[:n_use]
-            if self._idx == 0:
-                for offset in range(self._n_samples - self._step, 0,
-                                    -self._step):
-                    this_window[:offset] += self._window[-offset:]
+            this_window = _edge_window(
+                self._window, self._step, this_len, self._idx == 0,
+                self._idx == len(self.starts) - 1)
             # logger.debug('    * Processing %d->%d' % (start, stop))
             this_proc = [in_[..., :this_len].copy()
                          for in_ in self._in_buffers]
@@ -587,6 +580,20 @@ class COLA:
                 ob[..., -delta:] = 0.
 
 
+def _edge_window(window, step, this_len, first, last):
+    """Extend a COLA window so the first and last windows sum to one."""
+    this_window = window.copy()
+    if last:
+        this_window = np.pad(window, (0, this_len - len(window)), 'constant')
+        for offset in range(step, len(this_window), step):
+            n_use = len(this_window) - offset
+            this_window[offset:] += window[:n_use]
+    if first:
+        for offset in range(len(window) - step, 0, -step):
+            this_window[:offset] += window[-offset:]
+    return this_window
+
+
 def _check_cola(win, nperseg, step, window_name, tol=1e-10):
     """Check whether the Constant OverLap Add (COLA) constraint is met."""
     # adapted from SciPy
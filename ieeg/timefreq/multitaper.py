@@ -1,5 +1,5 @@
-from collections import Counter
-from functools import cache, singledispatch
+from concurrent.futures import ThreadPoolExecutor
+from functools import singledispatch
 from typing import Union
 
 import numpy as np
@@ -11,9 +11,10 @@ from mne.utils import _pl, fill_doc, logger, verbose
 from scipy import fft, signal, stats
 
 from ieeg import ListNum
+from ieeg.calc.fast import overlap_add, sum_sinusoids
 from ieeg.calc.scaling import rescale
 from ieeg.calc.stats import sine_f_test
-from ieeg.process import COLA, is_number
+from ieeg.process import _check_cola, _edge_window
 from ieeg.timefreq.utils import crop_pad, to_samples
 
 
@@ -38,6 +39,12 @@ class WindowingRemover(object):
         The bandwidth of the multitaper windowing function.
     p_value : float
         The p-value to use in the F-test.
+    precision : str
+        The floating point precision of the spectral estimation, either
+        'float64' or 'float32'. The fitted sinusoids are always subtracted in
+        double precision.
+    workers : int
+        The number of threads used to clean the windows of each signal.
     verbose : bool
         Whether to print information.
     """
@@ -46,6 +53,7 @@ class WindowingRemover(object):
     def __init__(self, sfreq: float, line_freqs: ListNum,
                  notch_width: ListNum, filter_length: int, low_bias: bool,
                  adaptive: bool, bandwidth: float, p_value: float,
+                 precision: str = 'float64', workers: int = 1,
                  verbose: bool = None):
         self.sfreq = sfreq
         self.line_freqs = line_freqs
@@ -56,8 +64,14 @@ class WindowingRemover(object):
         self.low_bias = low_bias
         self.adaptive = adaptive
         self.bandwidth = bandwidth
+        self.workers = workers
+        self.dtype = np.dtype(precision)
+        if self.dtype not in (np.float32, np.float64):
+            raise ValueError("precision must be 'float32' or 'float64', got "
+                             f"{precision}")
         self.logger = logger
         self.rm_freqs = list()
+        self._thresh = dict()
 
     def dpss_windows(self, N: int, half_nbw: float, Kmax: int, *,
                      sym: bool = True, norm: Union[int, str] = None
@@ -173,10 +187,12 @@ class WindowingRemover(object):
 
         return window_fun, eigvals, self.adaptive
 
-    @cache
     def get_thresh(self, n_times: int = None) -> tuple[np.ndarray, float]:
         """Get the window function and threshold for given time points.
 
+        Results are stored on the instance, so they are computed once per
+        window length and travel with the instance to parallel workers.
+
         Parameters
         ----------
         n_times : int | None
@@ -193,50 +209,121 @@ class WindowingRemover(object):
         if n_times is None:
             n_times = self.filter_length
 
-        # figure out what tapers to use
-        window_fun, _, _ = self.params(n_times)
+        if n_times not in self._thresh:
+            # figure out what tapers to use
+            window_fun, _, _ = self.params(n_times)
+            window_fun = window_fun.astype(self.dtype, copy=False)
+
+            # F-stat of 1-p point
+            threshold = stats.f.ppf(1 - self.p_value / n_times, 2,
+                                    2 * len(window_fun) - 2)
+            self._thresh[n_times] = (window_fun, threshold)
+        return self._thresh[n_times]
+
+    def prepare(self, n_times: int):
+        """Precompute the tapers and thresholds for every window length.
 
-        # F-stat of 1-p point
-        threshold = stats.f.ppf(1 - self.p_value / n_times, 2,
-                                2 * len(window_fun) - 2)
-        return window_fun, threshold
+        Overlap-add processing uses windows of the filter length, except for
+        the final window which absorbs the remainder of the signal.
+
+        Parameters
+        ----------
+        n_times : int
+            The number of time points in each signal to be processed.
+        """
+        n_samples = self.filter_length
+        step = n_samples - (n_samples + 1) // 2
+        last = n_times - np.arange(0, n_times - n_samples + 1, step)[-1]
+        for n in {n_samples, last}:
+            self.get_thresh(n)
 
     def __call__(self, x: np.ndarray) -> np.ndarray:
-        """Remove line frequencies from data using multitaper method."""
+        """Remove line frequencies from data using multitaper method.
+
+        x may be a single signal or a stack of signals of shape
+        (n_signals, n_times), whose windows are cleaned together."""
         # Set default window function and threshold
         window_fun, thresh = self.get_thresh()
-        n_times = x.shape[-1]
+        x_2d = np.atleast_2d(x)
+        n_signals, n_times = x_2d.shape
         n_samples = window_fun.shape[1]
-        n_overlap = (n_samples + 1) // 2
-        x_out = np.zeros_like(x)
-        idx = [0]
-
-        # Define how to process a chunk of data
-        def process(x_):
-            window_fun, thresh = self.get_thresh()
-            out = _mt_remove(x_, self.sfreq, self.line_freqs, self.notch_width,
-                             window_fun, thresh, self.get_thresh)
-            self.rm_freqs.append(out[1])
-            return (out[0],)  # must return a tuple
-
-        # Define how to store a chunk of fully processed data (it's trivial)
-        def store(x_):
-            stop = idx[0] + x_.shape[-1]
-            x_out[..., idx[0]:stop] += x_
-            idx[0] = stop
-
-        COLA(process, store, n_times, n_samples, n_overlap, self.sfreq,
-             verbose=False).feed(x)
-        assert idx[0] == n_times
+        step = n_samples - (n_samples + 1) // 2
+        starts = np.arange(0, n_times - n_samples + 1, step)
+        window = signal.get_window('hann', n_samples,
+                                   fftbins=bool((n_samples - 1) % 2))
+        window /= _check_cola(window, n_samples, step, 'hann')
+        x_out = np.zeros(x_2d.shape, dtype=np.float64)
+
+        # every window but the last one of each signal has the filter length,
+        # so they are cleaned in stacked batches that may span signals,
+        # keeping the tapered spectra of a batch around 64 MB, and
+        # overlap-added in a single pass
+        n_win = len(starts) - 1
+        windows = np.lib.stride_tricks.sliding_window_view(
+            x_2d, n_samples, axis=-1)[:, :n_win * step:step]
+        n_windows = n_signals * n_win
+        batch = max(1, min(2 ** 22 // window_fun.size,
+                           -(-n_windows // self.workers)))
+        batches = range(0, n_windows, batch)
+
+        # batches are independent until they are overlap-added, so they are
+        # cleaned on separate threads, which numpy and the FFTs let run in
+        # parallel, and added to the output in order as they finish
+        threads = max(1, min(self.workers, len(batches)))
+        fft_workers = max(1, self.workers // threads)
+
+        def clean(i: int) -> tuple[np.ndarray, np.ndarray]:
+            stop = min(i + batch, n_windows)
+            if i // n_win == (stop - 1) // n_win:
+                # windows of a single signal are a view
+                wins = windows[i // n_win, i % n_win:i % n_win + stop - i]
+            else:
+                idx = np.arange(i, stop)
+                wins = windows[idx // n_win, idx % n_win]
+            return _mt_remove(wins, self.sfreq, self.line_freqs,
+                              self.notch_width, window_fun, thresh,
+                              self.get_thresh, fft_workers)
+
+        first = _edge_window(window, step, n_samples, True, False)
+        with ThreadPoolExecutor(threads) as pool:
+            results = pool.map(clean, batches) if threads > 1 else map(
+                clean, batches)
+            for i, (out, rm) in zip(batches, results):
+                self.rm_freqs.append(rm)
+                # add the windows of each signal in the batch to its output
+                k, stop = i, min(i + batch, n_windows)
+                while k < stop:
+                    sig, w = divmod(k, n_win)
+                    end = min(stop, (sig + 1) * n_win)
+                    chunk = out[k - i:end - i]
+                    if w == 0:
+                        x_out[sig, :n_samples] += chunk[0] * first
+                        overlap_add(chunk[1:], window, x_out[sig], step, step)
+                    else:
+                        overlap_add(chunk, window, x_out[sig], starts[w], step)
+                    k = end
+
+        # the last window of each signal absorbs the remainder of the signal
+        n_last = n_times - starts[-1]
+        last = _edge_window(window, step, n_last, n_win == 0, True)
+        rows = max(1, 2 ** 22 // self.get_thresh(n_last)[0].size)
+        for i in range(0, n_signals, rows):
+            out, rm = _mt_remove(x_2d[i:i + rows, starts[-1]:], self.sfreq,
+                                 self.line_freqs, self.notch_width,
+                                 window_fun, thresh, self.get_thresh,
+                                 self.workers)
+            self.rm_freqs.append(rm)
+            x_out[i:i + rows, starts[-1]:] += out * last
+        x_out = x_out.astype(x.dtype, copy=False).reshape(x.shape)
 
         # report found frequencies, but do some sanitizing first by binning
         # into 1 Hz bins
-        counts = Counter(sum((np.unique(np.round(ff)).tolist()
-                              for f in self.rm_freqs for ff in f), list()))
+        found = np.round(np.concatenate(self.rm_freqs or [np.empty(0)]))
+        freqs, counts = np.unique(found, return_counts=True)
         kind = 'Detected' if self.line_freqs is None else 'Removed'
-        found_freqs = '\n'.join(f'    {freq:6.2f} : '
-                                f'{counts[freq]:4d} window{_pl(counts[freq])}'
-                                for freq in sorted(counts)) or '    None'
+        found_freqs = '\n'.join(f'    {freq:6.2f} : {count:4d} window'
+                                f'{_pl(count)}' for freq, count in
+                                zip(freqs, counts)) or '    None'
         self.logger.info(f'{kind} notch frequencies (Hz):\n{found_freqs}')
 
         x = x_out
@@ -245,53 +332,90 @@ class WindowingRemover(object):
 
 def _mt_remove(x: np.ndarray, sfreq: float, line_freqs: ListNum,
                notch_widths: ListNum, window_fun: np.ndarray,
-               threshold: float, get_thresh: callable,
-               ) -> tuple[np.ndarray, list[float]]:
+               threshold: float, get_thresh: callable, workers: int = 1,
+               ) -> tuple[np.ndarray, np.ndarray]:
     """Use MT-spectrum to remove line frequencies.
     Based on Chronux. If line_freqs is specified, all freqs within notch_width
     of each line_freq is set to zero.
+
+    x may be a single window or a stack of windows of shape (n_win, n_times),
+    in which case the spectra of the whole stack are computed at once. The
+    removed frequencies of all windows are returned together in one array,
+    with an entry per window they were removed from. If nothing is removed,
+    x itself is returned, so callers must not modify the output in place.
     """
 
-    assert x.ndim == 1
+    assert x.ndim in (1, 2)
     if x.shape[-1] != window_fun.shape[-1]:
         window_fun, threshold = get_thresh(x.shape[-1])
-    # compute mt_spectrum (returning n_ch, n_tapers, n_freq)
-    x_p, freqs = spectra(x[np.newaxis, :], window_fun, sfreq)
-    f_stat, A = sine_f_test(window_fun, x_p)
+    x_2d = np.atleast_2d(x)
+    # compute mt_spectrum (returning n_win, n_tapers, n_freq)
+    x_p, freqs = spectra(x_2d.astype(window_fun.dtype, copy=False),
+                         window_fun, sfreq, workers=workers)
 
-    # find frequencies to remove
-    indices = np.where(f_stat > threshold)[1]
-    # pdf = 1-stats.f.cdf(f_stat, 2, window_fun.shape[0]-2)
-    # indices = np.where(pdf < 1/x.shape[-1])[1]
     # specify frequencies within indicated ranges
     if line_freqs is not None and notch_widths is not None:
-        if not isinstance(notch_widths, (list, tuple)) and is_number(
-                notch_widths):
-            notch_widths = [notch_widths] * len(line_freqs)
-        ranges = [(freq - notch_width / 2, freq + notch_width / 2
-                   ) for freq, notch_width in zip(line_freqs, notch_widths)]
-        indices = [ind for ind in indices if any(
-            lower <= freqs[ind] <= upper for (lower, upper) in ranges)]
-
-    fits = list()
-    # make "time" vector
-    rads = 2 * np.pi * (np.arange(x.size) / float(sfreq))
-    for ind in indices:
-        c = 2 * A[0, ind]
-        fit = np.abs(c) * np.cos(freqs[ind] * rads + np.angle(c))
-        fits.append(fit)
-
-    if len(fits) == 0:
-        datafit = 0.0
+        freq_mask = _notch_mask(freqs, line_freqs, notch_widths)
+        bins = np.flatnonzero(freq_mask)
+        if bins.size and bins[-1] - bins[0] + 1 == bins.size:
+            # a single notch (e.g. only 60 Hz) is one run of bins, so the
+            # spectra can be sliced as a view instead of copied by the mask
+            freq_mask = slice(bins[0], bins[-1] + 1)
+        # only the candidate bins need to be tested
+        freqs = freqs[freq_mask]
     else:
-        # fitted sinusoids are summed, and subtracted from data
-        datafit = np.sum(fits, axis=0)
+        freq_mask = None
+    f_stat, A = sine_f_test(window_fun, x_p, freq_mask)
 
-    return x - datafit, freqs[indices]
+    # find frequencies to remove
+    # pdf = 1-stats.f.cdf(f_stat, 2, window_fun.shape[0]-2)
+    # indices = np.where(pdf < 1/x.shape[-1])[1]
+    found = f_stat > threshold
+    if not found.any():
+        # clean windows are passed through without copying them
+        return x, freqs[:0]
+    out = np.array(x_2d, dtype=np.float64)
+    for i, row in enumerate(found):
+        indices = np.flatnonzero(row)
+        if len(indices) > 0:
+            # fitted sinusoids are summed, and subtracted from data in place
+            sum_sinusoids(freqs[indices], -2 * A[i, indices], sfreq,
+                          x.shape[-1], out=out[i])
+
+    # the removed frequencies of every window, in window order
+    return out.reshape(x.shape), freqs[np.nonzero(found)[1]]
+
+
+def _notch_mask(freqs: np.ndarray, line_freqs: ListNum,
+                notch_widths: ListNum) -> np.ndarray:
+    """Find the frequencies within notch_width / 2 of any line frequency.
+
+    Examples
+    --------
+    >>> _notch_mask(np.arange(0, 200, 10.), [60, 120], 20)
+    array([False, False, False, False, False,  True,  True,  True, False,
+           False, False,  True,  True,  True, False, False, False, False,
+           False, False])
+    >>> _notch_mask(np.arange(5.), [1, 2], [2, 1]).astype(int)
+    array([1, 1, 1, 0, 0])
+    """
+    line_freqs = np.atleast_1d(np.asarray(line_freqs, dtype=float))
+    half = np.broadcast_to(np.asarray(notch_widths, dtype=float) / 2,
+                           line_freqs.shape)
+    order = np.argsort(line_freqs - half)
+    lows = (line_freqs - half)[order]
+    highs = (line_freqs + half)[order]
+    if np.all(lows[1:] > highs[:-1]):
+        # disjoint ranges, so only the closest lower bound can contain freq
+        i = np.searchsorted(lows, freqs, side='right') - 1
+        return (i >= 0) & (freqs <= highs[np.maximum(i, 0)])
+    return np.any((freqs[:, None] >= lows) & (freqs[:, None] <= highs),
+                  axis=1)
 
 
 def spectra(x: np.ndarray, dpss: np.ndarray, sfreq: float,
-            n_fft: int = None) -> tuple[np.ndarray, np.ndarray]:
+            n_fft: int = None, workers: int = 1
+            ) -> tuple[np.ndarray, np.ndarray]:
     """Compute significant tapered spectra.
 
     Parameters
@@ -305,6 +429,8 @@ def spectra(x: np.ndarray, dpss: np.ndarray, sfreq: float,
     n_fft : int | None
         Length of the FFT. If None, the number of samples in the input signal
         will be used.
+    workers : int
+        Number of threads scipy.fft may use to transform the tapered signals.
 
     Returns
     -------
@@ -323,7 +449,7 @@ def spectra(x: np.ndarray, dpss: np.ndarray, sfreq: float,
     freqs = fft.rfftfreq(n_fft, 1. / sfreq)
 
     # The following is equivalent to this, but uses less memory:
-    x_mt = fft.rfft(x[:, np.newaxis, :] * dpss, n=n_fft, workers=1)
+    x_mt = fft.rfft(x[:, np.newaxis, :] * dpss, n=n_fft, workers=workers)
     # n_tapers = dpss.shape[0] if dpss.ndim > 1 else 1
     # x_mt = np.zeros(x.shape[:-1] + (n_tapers, len(freqs)),
     #                 dtype=np.complex128)
@@ -324,7 +324,7 @@ def _check_filterable(x: Union[Signal, np.ndarray],
                 'instead.')
     validate_type(x, (np.ndarray, list, tuple))
     x = np.asanyarray(x)
-    if x.dtype != np.float64:
+    if x.dtype not in (np.float32, np.float64):
         raise ValueError('Data to be %s must be real floating, got %s'
                          % (kind, x.dtype,))
     return x
@@ -1,14 +1,17 @@
-import csv
 import os.path as op
+import weakref
 from collections import OrderedDict, namedtuple
 from collections.abc import Iterable, Sequence
-from functools import singledispatch
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, singledispatch
 
 import mne
 import nibabel as nib
 import numpy as np
 import pandas as pd
+from mne.io import pick
 from mne.viz import Brain
+from scipy.signal import hilbert
 
 from ieeg import PathLike, Signal
 from ieeg.io import get_elec_volume_labels
@@ -37,26 +40,115 @@ def plot_overlay(image: nib.Nifti1Image, compare: nib.Nifti1Image,
     thresh : float, optional
         The threshold to apply to the overlay, by default None
     """
-    image = nib.orientations.apply_orientation(
-        np.asarray(image.dataobj), nib.orientations.axcodes2ornt(
-            nib.orientations.aff2axcodes(image.affine))).astype(np.float32)
-    compare = nib.orientations.apply_orientation(
-        np.asarray(compare.dataobj), nib.orientations.axcodes2ornt(
-            nib.orientations.aff2axcodes(compare.affine))).astype(np.float32)
     if thresh is not None:
-        compare[compare < np.quantile(compare, thresh)] = np.nan
+        cutoff = _cutoff(compare, thresh)
     fig, axes = plt.subplots(1, 3, figsize=(12, 4))
     fig.suptitle(title)
     for i, ax in enumerate(axes):
-        ax.imshow(np.take(image, [image.shape[i] // 2], axis=i).squeeze().T,
-                  cmap='gray')
-        ax.imshow(np.take(compare, [compare.shape[i] // 2],
-                          axis=i).squeeze().T, cmap='gist_heat', alpha=0.5)
+        overlay = _oriented_mid_slice(compare, i)
+        if thresh is not None:
+            overlay = np.where(overlay < cutoff, np.nan, overlay)
+        ax.imshow(_oriented_mid_slice(image, i).T, cmap='gray')
+        ax.imshow(overlay.T, cmap='gist_heat', alpha=0.5)
         ax.invert_yaxis()
         ax.axis('off')
     fig.tight_layout()
 
 
+_CUTOFFS = weakref.WeakKeyDictionary()
+
+
+def _cutoff(img: nib.Nifti1Image, q: float) -> float:
+    """Get the exact q'th quantile of the image's voxels
+
+    The result is cached per image and quantile, so replotting a volume with
+    the same threshold does not read or partition it again. The volume itself
+    is only read for as long as the quantile takes.
+    """
+    cutoffs = _CUTOFFS.setdefault(img, {})
+    if q not in cutoffs:
+        # the quantile needs every voxel, but not in any particular
+        # orientation
+        cutoffs[q] = _quantile(np.asarray(img.dataobj, dtype=np.float32), q)
+    return cutoffs[q]
+
+
+def _oriented_mid_slice(img: nib.Nifti1Image, axis: int) -> np.ndarray:
+    """Get the middle slice along an axis of the image in its affine's
+    orientation as float32
+
+    Only the slab holding the slice is read from the image's data proxy, and
+    only that slab is flipped and transposed into the affine's orientation.
+    """
+    ornt = nib.orientations.axcodes2ornt(
+        nib.orientations.aff2axcodes(img.affine))
+    # the input axis that becomes the requested axis, and the input index of
+    # the middle of that axis once any flip is applied
+    src = int(np.flatnonzero(ornt[:, 0] == axis)[0])
+    n = img.shape[src]
+    idx = [slice(None)] * len(img.shape)
+    start = n - 1 - n // 2 if ornt[src, 1] < 0 else n // 2
+    idx[src] = slice(start, start + 1)
+    slab = np.asarray(img.dataobj[tuple(idx)], dtype=np.float32)
+    return _mid_slice(nib.orientations.apply_orientation(slab, ornt), axis)
+
+
+def _quantile(arr: np.ndarray, q: float) -> float:
+    """Linearly interpolated quantile using a single partition
+
+    Equivalent to ``np.quantile(arr, q)``, which partitions around two
+    indices at once and is several times slower on large volumes.
+
+    Examples
+    --------
+    >>> arr = np.random.default_rng(0).random((20, 30))
+    >>> bool(np.isclose(_quantile(arr, 0.3), np.quantile(arr, 0.3)))
+    True
+    >>> float(_quantile(np.array([4., 1., 3., 2.]), 0.5))
+    2.5
+    """
+    flat = arr.reshape(-1)
+    h = q * (flat.size - 1)
+    lo = int(h)
+    part = np.partition(flat, lo)
+    if lo + 1 >= flat.size:
+        return part[lo]
+    # everything after lo is at least as large, so its min is the next order
+    # statistic
+    return part[lo] + (part[lo + 1:].min() - part[lo]) * (h - lo)
+
+
+def _mid_slice(arr: np.ndarray, axis: int) -> np.ndarray:
+    """Get a view of the middle slice of an array along an axis
+
+    Examples
+    --------
+    >>> arr = np.arange(27).reshape(3, 3, 3)
+    >>> _mid_slice(arr, 1)
+    array([[ 3,  4,  5],
+           [12, 13, 14],
+           [21, 22, 23]])
+    >>> np.shares_memory(arr, _mid_slice(arr, 2))
+    True
+    """
+    idx = [slice(None)] * arr.ndim
+    idx[axis] = arr.shape[axis] // 2
+    return arr[tuple(idx)]
+
+
+def _in_memory(img: nib.spatialimages.SpatialImage
+               ) -> nib.spatialimages.SpatialImage:
+    """Read an image into a float32 array held in memory
+
+    The registration reads the volume several times, so decompress it once.
+    Scanner intensities are integers, so float32 loses no precision and halves
+    the memory of a float64 read. The header is kept, so the image still
+    carries the source's qform/sform codes and on-disk data type.
+    """
+    return type(img)(np.asarray(img.dataobj, dtype=np.float32), img.affine,
+                     img.header)
+
+
 def allign_CT(t1_path: PathLike, ct_path: PathLike, reg_affine=None
               ) -> nib.spatialimages.SpatialImage:
     """Alligns a CT scan to a T1 scan
@@ -75,8 +167,8 @@ def allign_CT(t1_path: PathLike, ct_path: PathLike, reg_affine=None
     nib.spatialimages.SpatialImage
         The alligned CT scan
     """
-    T1 = nib.load(t1_path)
-    CT_orig = nib.load(ct_path)
+    T1 = _in_memory(nib.load(t1_path, mmap=False))
+    CT_orig = _in_memory(nib.load(ct_path, mmap=False))
     sdr_morph = None
     if reg_affine is None:
         reg_affine, sdr_morph = mne.transforms.compute_volume_registration(
@@ -217,16 +309,23 @@ def plot_gamma(evoked: mne.Evoked, subjects_dir: PathLike = None, **kwargs):
     **kwargs
         Additional arguments to pass to plot_on_average
         """
-    data = evoked.copy().filter(30, 150).apply_hilbert(envelope=True)._data
+    # filter a copy of the data channels only, and take the envelope in
+    # single precision as it is only drawn
+    picks = pick._picks_to_idx(evoked.info, 'data', exclude=())
+    data = mne.filter.filter_data(evoked.data[picks], evoked.info['sfreq'],
+                                  30, 150, pad='edge')
+    n_times = data.shape[-1]
+    data = np.abs(hilbert(data.astype(np.float32),
+                          mne.filter.next_fast_len(n_times))[..., :n_times])
     fig = plot_on_average(evoked.info, subjects_dir=subjects_dir, **kwargs)
     mne.viz.set_3d_view(fig, azimuth=0, elevation=70)
 
     xy, im = mne.viz.snapshot_brain_montage(fig, evoked.info)
     # convert from a dictionary to array to plot
-    xy_pts = np.vstack([xy[ch] for ch in evoked.info['ch_names']])
+    xy_pts = np.vstack([xy[evoked.info['ch_names'][i]] for i in picks])
 
     # get a colormap to color nearby points similar colors
-    cmap = matplotlib.cm.get_cmap('viridis')
+    cmap = matplotlib.colormaps['viridis']
 
     # create the figure of the brain with the electrode positions
     fig, ax = plt.subplots(figsize=(5, 5))
@@ -234,16 +333,20 @@ def plot_gamma(evoked: mne.Evoked, subjects_dir: PathLike = None, **kwargs):
     ax.imshow(im)
     ax.set_axis_off()
 
-    # normalize gamma power for plotting
-    gamma_power = -100 * data / data.max()
-    # add the time course overlaid on the positions
+    # build one (channels, times, xy) buffer of line segments, normalizing
+    # gamma power and offsetting it to the electrode positions in place
+    segs = np.empty(data.shape + (2,), dtype=np.float32)
     x_line = np.linspace(-0.025 * im.shape[0], 0.025 * im.shape[0],
                          data.shape[1])
-    for i, pos in enumerate(xy_pts):
-        x, y = pos
-        color = cmap(i / xy_pts.shape[0])
-        ax.plot(x_line + x, gamma_power[i] + y, linewidth=0.5,
-                color=color)
+    np.add(x_line, xy_pts[:, 0, None], out=segs[..., 0])
+    np.multiply(data, -100 / data.max(), out=segs[..., 1], casting='unsafe')
+    segs[..., 1] += xy_pts[:, 1, None]
+
+    # add the time courses overlaid on the positions in a single artist
+    colors = cmap(np.arange(xy_pts.shape[0]) / xy_pts.shape[0])
+    ax.add_collection(matplotlib.collections.LineCollection(
+        segs, colors=colors, linewidths=0.5))
+    ax.autoscale_view()
 
 
 def get_grey_matter(subjects: Sequence[str]) -> set[str]:
@@ -359,68 +462,109 @@ def plot_on_average(sigs: Signal | str | mne.Info | list[Signal | str, ...],
     elif isinstance(picks[0], str):
         if len(sigs) == 1 and not picks[0].startswith(list(sigs.keys())[0]):
             picks = [subj + '-' + p for p in picks]
-        picks_in = [p in all_channel_name for p in picks]
+        all_channel_set = set(all_channel_name)
+        picks_in = [p in all_channel_set for p in picks]
         assert all(picks_in), (f"Channel not found: "
                                f"{picks[picks_in.index(False)]}")
     else:
         raise TypeError(f"picks must be list of str or int, not "
                         f"{type(picks[0])}")
 
+    # split the picks by subject once, and keep their positions for colors
+    subj_picks, pick_pos = {}, {}
+    for i, p in enumerate(picks):
+        pick_pos.setdefault(p, i)
+        p = p.split('-')
+        subj_picks.setdefault(p[0], []).append(p[1])
+
     default_c = parula.mat_colors.copy()
-    for subj, new in sigs.items():
+    if average != 'fsaverage':
+        from_average = np.linalg.inv(_talxfm(average, subj_dir))
+
+    # read each subject's transform and labels in the background, so that the
+    # files for the next subjects load while the current one is rendered.
+    # Subjects without picks are skipped before any of their files are read.
+    with ThreadPoolExecutor(1) as pool:
+        reads = {subj: pool.submit(_read_subject, subj, subj_dir, rm_wm)
+                 for subj in sigs if subj in subj_picks}
+        for subj, new in sigs.items():
+            if subj not in reads:
+                continue
+            to_fsaverage = reads[subj].result()
 
-        to_fsaverage = mne.read_talxfm(subj, subj_dir)
-        if average == 'fsaverage':
-            trans = mne.transforms.Transform(fro='head', to='mri',
-                                             trans=to_fsaverage['trans'])
-        else:
-            from_average = mne.read_talxfm(average, subj_dir)
-            to_average = np.dot(np.linalg.inv(from_average['trans']),
-                                to_fsaverage['trans'])
-            trans = mne.transforms.Transform(fro='head', to='mri',
-                                             trans=to_average)
-
-        pick_gen = (p.split('-') for p in picks)
-        these_picks = [p[1] for p in pick_gen if p[0] == subj]
-
-        if rm_wm:
-            these_picks = pick_no_wm(these_picks, gen_labels(
-                new, subj, subj_dir, picks=new.ch_names))
-
-        if len(these_picks) == 0:
-            continue
-
-        # select colors
-        if color is None and len(sigs) > 1:
-            this_color = []
-            p_int = [new.ch_names.index(p) for p in these_picks]
-            groups = _group_channels(mne.pick_info(new, p_int))
-            n_groups = len(set(groups.values()))
-            while len(this_color) < n_groups:
-                this_color += [default_c.pop(0)]
-        elif np.isscalar(color) or color is None:
-            this_color = color
-        elif len(color) == len(picks):
-            this_color = [color[picks.index(subj + '-' + p)]
-                          for p in these_picks]
-        else:
-            this_color = color
+            these_picks = subj_picks[subj]
 
-        if not np.isscalar(size):
-            size = list(size)
-            this_size = [size.pop(0) for p in these_picks]
-        else:
-            this_size = [size] * len(these_picks)
+            if rm_wm:
+                these_picks = pick_no_wm(these_picks, gen_labels(
+                    new, subj, subj_dir, picks=new.ch_names))
+
+            if len(these_picks) == 0:
+                continue
 
-        # plot the data
-        plot_subj(new, subj_dir, these_picks, False, fig=fig,
-                  trans=trans, color=this_color, size=this_size,
-                  labels_every=label_every, hemi=hemi, background=background,
-                  show=show)
+            if average == 'fsaverage':
+                trans = mne.transforms.Transform(fro='head', to='mri',
+                                                 trans=to_fsaverage.copy())
+            else:
+                to_average = np.dot(from_average, to_fsaverage)
+                trans = mne.transforms.Transform(fro='head', to='mri',
+                                                 trans=to_average)
+            ch_idx = {ch: i for i, ch in enumerate(new.ch_names)}
+            p_int = [ch_idx[p] for p in these_picks]
+
+            # select colors
+            if color is None and len(sigs) > 1:
+                this_color = []
+                groups = _group_channels(mne.pick_info(new, p_int))
+                n_groups = len(set(groups.values()))
+                while len(this_color) < n_groups:
+                    this_color += [default_c.pop(0)]
+            elif np.isscalar(color) or color is None:
+                this_color = color
+            elif len(color) == len(picks):
+                this_color = [color[pick_pos[subj + '-' + p]]
+                              for p in these_picks]
+            else:
+                this_color = color
+
+            if not np.isscalar(size):
+                size = list(size)
+                this_size = [size.pop(0) for p in these_picks]
+            else:
+                this_size = [size] * len(these_picks)
+
+            # plot the data, passing indices so the channels are not searched
+            # for again
+            plot_subj(new, subj_dir, p_int, False, fig=fig,
+                      trans=trans, color=this_color, size=this_size,
+                      labels_every=label_every, hemi=hemi,
+                      background=background, show=show)
 
     return fig
 
 
+def _read_subject(subj: str, subj_dir: PathLike, labels: bool
+                  ) -> np.ndarray:
+    """Read the files plot_on_average needs for a subject into the caches
+
+    Returns the talairach transform of the subject to fsaverage.
+    """
+    if labels:
+        _channel_labels(subj, subj_dir, ".a2009s")
+    return _talxfm(subj, subj_dir)
+
+
+@lru_cache(maxsize=64)
+def _talxfm(subject: str, subjects_dir: PathLike) -> np.ndarray:
+    """Read the talairach transform of a subject to fsaverage once
+
+    The matrix is returned read-only, as it is shared between calls, so copy
+    it before handing it to anything that may modify it.
+    """
+    trans = mne.read_talxfm(subject, subjects_dir)['trans']
+    trans.flags.writeable = False
+    return trans
+
+
 def pick_no_wm(picks: list[str], labels: OrderedDict[str: list[str]]) -> list:
     """Picks the channels that are not in the white matter
 
@@ -435,6 +579,16 @@ def pick_no_wm(picks: list[str], labels: OrderedDict[str: list[str]]) -> list:
     -------
     list[str | int]
         The channels that are not in the white matter
+
+    Examples
+    --------
+    >>> labels = OrderedDict(A1='Left-Hippocampus',
+    ...                      A2='Left-Cerebral-White-Matter',
+    ...                      A3='ctx-lh-insula', A4='Unknown')
+    >>> pick_no_wm(['A1', 'A2', 'A3', 'A4'], labels)
+    ['A1', 'A3']
+    >>> pick_no_wm([1, 2], labels)
+    ['A3']
     """
     bad_words = ('Unknown', 'unknown', 'hypointensities', 'White-Matter')
     if len(picks) == 0:
@@ -442,7 +596,8 @@ def pick_no_wm(picks: list[str], labels: OrderedDict[str: list[str]]) -> list:
     # remove corresponding picks with either 'White-Matter' in the left most
     # entry or empty lists
     if isinstance(picks[0], int):
-        picks = [list(labels.keys())[p] for p in picks]
+        names = list(labels.keys())
+        picks = [names[p] for p in picks]
     picks = [p for p in picks if not any(w in labels[p] for w in bad_words)]
     return picks
 
@@ -577,10 +732,12 @@ def plot_subj(inst: Signal | mne.Info | str, subj_dir: PathLike = None,
         color = list(color)
 
     # fig.add_sensors(info, trans)
-    montage = info.get_montage()
-    force2frame(montage, trans.from_str)
-    montage.apply_trans(trans)
-    pos = {k: v for k, v in montage.get_positions()['ch_pos'].items()}
+    # read the positions once and transform them as a single array instead of
+    # relabelling and transforming the montage's dig points. The relabel done
+    # by force2frame is an identity transform, so only ``trans`` is applied.
+    ch_pos = info.get_montage().get_positions()['ch_pos']
+    xyz = mne.transforms.apply_trans(trans, np.array(list(ch_pos.values())))
+    pos = dict(zip(ch_pos.keys(), xyz))
 
     # Default montage positions are in m, whereas plotting functions assume mm
     left = {}
@@ -678,29 +835,40 @@ def _add_electrodes(fig: mne.viz.Brain, hemi: str,
                     pos: np.ndarray, colors: matplotlib.colors = None,
                     size: float | list = 0.35):
 
+    n = len(pos)
     if not np.isscalar(size) and len(colors[0]) == 4:
         assert len(size) == len(pos), "Size must be the same length as vals"
         assert len(colors) == len(pos), ("Colors must be the same length as"
                                          " vals")
-        for i, p in enumerate(pos):
-            fig.add_foci(p, hemi=hemi, color=colors[i][:3],
-                         scale_factor=size[i], alpha=colors[i][3])
+        alpha = [c[3] for c in colors]
+        colors = [c[:3] for c in colors]
     elif len(colors[0]) == 4:
         assert len(colors) == len(
             pos), "Colors must be the same length as vals"
-        for i, p in enumerate(pos):
-            fig.add_foci(p, hemi=hemi, color=colors[i][:3],
-                         scale_factor=size, alpha=colors[i][3])
+        alpha = [c[3] for c in colors]
+        colors = [c[:3] for c in colors]
+        size = [size] * n
     elif not np.isscalar(size):
         while len(colors) < len(size):
             colors.append(colors[-1])
         assert len(size) == len(pos), "Size must be the same length as vals"
-        for i, p in enumerate(pos):
-            fig.add_foci(p, hemi=hemi, color=colors[i],
-                         scale_factor=size[i])
+        alpha = [1] * n
     else:
-        for i, p in enumerate(pos):
-            fig.add_foci(p, hemi=hemi, color=colors, scale_factor=size)
+        fig.add_foci(pos, hemi=hemi, color=colors, scale_factor=size)
+        return
+
+    # electrodes that look the same are drawn together as one set of glyphs
+    # rather than one actor each
+    groups = {}
+    for i, key in enumerate(zip(map(_as_key, colors), size, alpha)):
+        groups.setdefault(key, []).append(i)
+    for (color, scale, a), idx in groups.items():
+        fig.add_foci(np.asarray(pos)[idx], hemi=hemi, color=color,
+                     scale_factor=scale, alpha=a)
+
+
+def _as_key(color) -> str | tuple:
+    return color if isinstance(color, str) else tuple(color)
 
 
 def _group_channels(info, groups: dict = None) -> dict:
@@ -783,13 +951,12 @@ def subject_to_info(subject: str, subjects_dir: PathLike = None,
     subjects_dir = get_sub_dir(subjects_dir)
     elec_file = op.join(subjects_dir, subject, 'elec_recon',
                         subject + '_elec_locations_RAS_brainshifted.txt')
-    elecs = dict()
-    with open(elec_file, 'r') as fd:
-        reader = csv.reader(fd)
-        for row in reader:
-            line = row[0].split(" ")
-            elecs["".join(line[0:2])] = tuple(
-                float(n) / 1000 for n in line[2:5])
+    # columns are: group, number, x, y, z (in mm)
+    rows = np.loadtxt(elec_file, dtype=str, usecols=range(5), ndmin=2)
+    names = np.char.add(rows[:, 0], rows[:, 1]).tolist()
+    coords = rows[:, 2:].astype(float) / 1000
+    # the montage takes rows of the (n, 3) position array as they are
+    elecs = dict(zip(names, coords))
     info = mne.create_info(list(elecs.keys()), sfreq, ch_types)
     montage = mne.channels.make_dig_montage(elecs, nasion=(0, 0, 0),
                                             coord_frame='ras')
@@ -849,19 +1016,28 @@ def gen_labels(info: mne.Info, sub: str = None, subj_dir: str = None,
     """
     sub = get_sub(info) if sub is None else sub
     subj_dir = get_sub_dir(subj_dir)
-    montage = info.get_montage()
-    force2frame(montage, 'mri')
     # aseg = 'aparc.a2009s+aseg'  # parcellation/anatomical segmentation atlas
-    labels = get_elec_volume_labels(sub, subj_dir, 10, atlas)
+    labels = _channel_labels(sub, subj_dir, atlas)
     if picks is None:
         picks = info.ch_names
     bad_words = ('Unknown', 'unknown', 'hypointensities', 'White-Matter')
     new_labels = OrderedDict()
     for p in picks:
-        new_labels[p] = _pick_label(labels.T[p], 0.05, bad_words)
+        new_labels[p] = _pick_label(labels[p], 0.05, bad_words)
     return new_labels
 
 
+@lru_cache(maxsize=32)
+def _channel_labels(sub: str, subj_dir: PathLike, atlas: str
+                    ) -> pd.DataFrame:
+    """Read the electrode volume labels of a subject once, one column per
+    channel
+
+    The table is shared between calls, so it must not be modified.
+    """
+    return get_elec_volume_labels(sub, subj_dir, 10, atlas).T
+
+
 def _pick_label(label: pd.Series, percent_thresh: float,
                 bad_words: list[str] = ('Unknown', 'unknown',
                                         'hypointensities', 'White-Matter')):
@@ -906,11 +1082,11 @@ def find_labels(info: mne.Info, sub: str = None, subj_dir: str = None,
     """
     sub = get_sub(info) if sub is None else sub
     subj_dir = get_sub_dir(subj_dir)
-    labels = get_elec_volume_labels(sub, subj_dir, 10, atlas)
+    labels = _channel_labels(sub, subj_dir, atlas)
     chlist = info.ch_names
     new_labels = OrderedDict()
     for c in chlist:
-        new_labels[c] = _find_label(labels.T[c], pct_thresh, hot_words)
+        new_labels[c] = _find_label(labels[c], pct_thresh, hot_words)
     return new_labels
 
 
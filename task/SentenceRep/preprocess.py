@@ -3,6 +3,7 @@ from ieeg.io import get_data, raw_from_layout
 from ieeg.navigate import crop_empty_data, channel_outlier_marker, trial_ieeg
 from ieeg.timefreq import gamma, utils
 from ieeg.calc import stats, scaling
+from ieeg.process import parallelize
 import numpy as np
 import os.path as op
 import os
@@ -30,17 +31,15 @@ new = crop_empty_data(filt, )
 # Mark channel outliers as bad
 new.info['bads'] = channel_outlier_marker(new, 4)
 
-# Exclude bad channels
-good = new.copy().drop_channels(new.info['bads'])
+# Exclude bad channels. The raw is not preloaded yet, so dropping in place
+# only updates the picks and load_data reads just the kept channels
+good = new.drop_channels(new.info['bads'])
 good.load_data()
 
 # CAR
 ch_type = filt.get_channel_types(only_data_chs=True)[0]
 good.set_eeg_reference(ref_channels="average", ch_type=ch_type)
 
-# Remove intermediates from mem
-del new
-
 # %% fix SentenceRep events
 from events import fix_annotations  # noqa E402
 fix_annotations(good)
@@ -52,17 +51,25 @@ for epoch, t in zip(("Start", "Word/Response/LS", "Word/Audio/LS",
                      "Word/Mime/LM", "Word/Audio/JL"),
                     ((-0.5, 0), (-1, 1), (-0.5, 1.5), (-0.5, 1.5), (-0.5, 1.5),
                      (-0.5, 1.5), (-0.5, 1.5), (1, 3))):
-    times = [None, None]
-    times[0] = t[0] - 0.5
-    times[1] = t[1] + 0.5
-    trials = trial_ieeg(good, epoch, times, preload=True, outliers=10)
-    gamma.extract(trials, copy=False, n_jobs=1)
+    times = [t[0] - 0.5, t[1] + 0.5]
+    out.append(trial_ieeg(good, epoch, times, preload=True, outliers=10))
+
+
+# only the gamma envelope of each condition is computed concurrently. It is
+# plain numpy on the epochs' arrays, while the MNE calls around it log and
+# warn through global state that is not thread-safe, so they stay serial.
+def _envelope(data: np.ndarray) -> np.ndarray:
+    return gamma.extract(data, good.info['sfreq'], copy=False, n_jobs=1,
+                         verbose=False)
+
+
+envelopes = parallelize(_envelope, [trials._data for trials in out],
+                        n_jobs=-1, prefer='threads')
+for trials, env in zip(out, envelopes):
+    trials._data = env
     utils.crop_pad(trials, "0.5s")
     trials.resample(100)
     trials.filenames = good.filenames
-    out.append(trials)
-    # if len(out) == 2:
-    #     break
 
 base = out.pop(0)
 
@@ -76,8 +83,6 @@ for epoch, name in zip(out, ("resp", "aud_ls", "aud_lm", "aud_jl", "go_ls",
                              "go_lm", "go_jl")):
     sig1 = epoch.get_data()
     sig2 = base.get_data()
-    sig2 = np.pad(sig2, ((0, 0), (0, 0), (0, sig1.shape[-1] - sig2.shape[-1])),
-                  mode='reflect')
     mask[name] = stats.time_perm_cluster(sig1, sig2, 0.05,
                                          n_perm=1000, ignore_adjacency=1)
     epoch_mask = mne.EvokedArray(mask[name], epoch.average().info)
@@ -23,42 +23,43 @@ new = crop_empty_data(filt)
 # Mark channel outliers as bad
 new.info['bads'] = channel_outlier_marker(new, 4)
 
-# Exclude bad channels
-good = new.copy().drop_channels(new.info['bads'])
+# Exclude bad channels. The raw is not preloaded yet, so dropping in place
+# only updates the picks and load_data reads just the kept channels
+good = new.drop_channels(new.info['bads'])
 good.load_data()
 
 # CAR
 good.set_eeg_reference(ref_channels="average", ch_type='ecog')
 
-# Remove intermediates from mem
-del new
-
 # %% fix SentenceRep events
 from events import fix_annotations  # noqa E402
 fix_annotations(good)
 
 # %% separate events
+freqs = np.arange(1, 200., 3.)
+n_cycles = freqs / 2
+# only pad the trials by half of the longest taper window, which is all the
+# support the transform needs at the edges that are cropped off afterwards
+pad = np.max(n_cycles / freqs) / 2
 
-resp = trial_ieeg(good, "Word/Response", (-1.5, 1.5), preload=True, outliers=8)
-base = trial_ieeg(good, "Start", (-1, 0.5), preload=True, outliers=8)
+resp = trial_ieeg(good, "Word/Response", (-1 - pad, 1 + pad), preload=True,
+                  outliers=8)
+base = trial_ieeg(good, "Start", (-0.5 - pad, pad), preload=True, outliers=8)
 
 # %% create spectrograms
-freqs = np.arange(1, 200., 3.)
-#
-resp_s = tfr_multitaper(resp, freqs, n_jobs=6, verbose=10, average=False,
-                        time_bandwidth=10, n_cycles=freqs/2, return_itc=False,
-                        decim=20)
+resp_s = tfr_multitaper(resp, freqs, n_jobs=-1, verbose=10, average=False,
+                        time_bandwidth=10, n_cycles=n_cycles,
+                        return_itc=False, decim=20)
 resp_s.crop(tmin=-1, tmax=1)
-base_s = tfr_multitaper(base, freqs, n_jobs=6, verbose=10, average=False,
-                        time_bandwidth=10, n_cycles=freqs/2, return_itc=False,
-                        decim=20)
+base_s = tfr_multitaper(base, freqs, n_jobs=-1, verbose=10, average=False,
+                        time_bandwidth=10, n_cycles=n_cycles,
+                        return_itc=False, decim=20)
 base_s.crop(tmin=-0.5, tmax=0)
 
 # %% run stats
 sig1 = resp_s.data
+# time_perm_cluster reflect pads the shorter baseline itself
 sig2 = base_s.data
-sig2 = np.pad(sig2, ((0, 0), (0, 0), (0, 0), (
-    0, sig1.shape[-1] - sig2.shape[-1])), mode='reflect')
 mask = stats.time_perm_cluster(sig1, sig2, 0.05, n_perm=500,
                                ignore_adjacency=1)
 signif = resp_s.copy().average()
@@ -33,6 +33,55 @@ def test_raw_from_layout():
     assert isinstance(raw, BaseRaw)
 
 
+def test_find_dat_symlink_cycle(tmp_path):
+    from ieeg.io import find_dat
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    (sub / "loop").symlink_to(tmp_path, target_is_directory=True)
+    # the linked directory cycle is not followed
+    with pytest.raises(FileNotFoundError, match="Not all"):
+        find_dat(str(tmp_path))
+    (sub / "D1_ieeg.dat").touch()
+    (tmp_path / "D1_cleanieeg.dat").touch()
+    ieeg, clean = find_dat(str(tmp_path))
+    assert ieeg == str(sub / "D1_ieeg.dat")
+    assert clean == str(tmp_path / "D1_cleanieeg.dat")
+
+
+@pytest.mark.parametrize("units, factor", [("V", 1), ("mV", 1e-3),
+                                           ("uV", 1e-6), ("nV", 1e-9)])
+def test_open_dat_file(tmp_path, units, factor):
+    from ieeg.io import open_dat_file
+    data = np.random.rand(3, 100).astype(np.float32)
+    fname = tmp_path / "data.dat"
+    data.T.tofile(fname)
+    raw = open_dat_file(str(fname), ["a", "Trigger", "b", "c"], 100,
+                        units=units)
+    assert raw.ch_names == ["a", "b", "c"]
+    assert not isinstance(raw._data, np.memmap)
+    assert np.allclose(raw.get_data(), data.astype(np.float64) * factor)
+
+
+def test_open_dat_file_memmap(tmp_path):
+    from ieeg.io import open_dat_file
+    data = np.random.rand(3, 100).astype(np.float32)
+    fname = tmp_path / "data.dat"
+    data.T.tofile(fname)
+    raw = open_dat_file(str(fname), ["a", "b", "c"], 100,
+                        preload=str(tmp_path / "raw.mmap"))
+    assert isinstance(raw._data, np.memmap)
+    assert np.allclose(raw.get_data(), data.astype(np.float64) * 1e-6)
+
+
+@pytest.mark.parametrize("preload", [True, False])
+def test_open_dat_file_preload_bool(tmp_path, preload):
+    from ieeg.io import open_dat_file
+    fname = tmp_path / "data.dat"
+    np.zeros((100, 3), dtype=np.float32).tofile(fname)
+    with pytest.raises(TypeError, match="preload"):
+        open_dat_file(str(fname), ["a", "b", "c"], 100, preload=preload)
+
+
 @pytest.mark.parametrize("n_jobs", [1, 8])
 def test_line_filter(n_jobs):
     from ieeg.mt_filter import line_filter
@@ -53,6 +102,21 @@ def test_line_filter(n_jobs):
     assert np.mean(np.abs(rpsd.get_data() - fpsd.get_data())) > 1e-10
 
 
+def test_line_filter_iir():
+    from ieeg.mt_filter import line_filter
+    sfreq = 1000.
+    times = np.arange(20000) / sfreq
+    data = np.random.randn(3, times.size) + np.sin(2 * np.pi * 60 * times)
+    raw = mne.io.RawArray(data, mne.create_info(3, sfreq, 'seeg'))
+    filt = line_filter(raw, freqs=[60], notch_widths=2., method='iir')
+    spec_raw = np.abs(np.fft.rfft(raw.get_data()))
+    spec_filt = np.abs(np.fft.rfft(filt.get_data()))
+    line = np.argmin(np.abs(np.fft.rfftfreq(times.size, 1 / sfreq) - 60))
+    assert np.all(spec_filt[:, line] < spec_raw[:, line] / 10)
+    with pytest.raises(ValueError):
+        line_filter(raw, freqs=None, method='iir')
+
+
 if os.path.isfile("spec.npy"):
     spec_check = np.load("spec.npy")
 else:
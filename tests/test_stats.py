@@ -101,3 +101,16 @@ def test_window_averaged_shuffle():
     p = window_averaged_shuffle(field, base, 10000, 1, 1)
     t = np.isclose(np.array([0.51315, 0.99920, 6.9993e-04]), p, 0, 0.05)
     assert np.all(t)
+
+
+@pytest.mark.parametrize("offset", [0., 1e4, 1e6])
+def test_power_std_offset(offset):
+    from ieeg.calc.fast import power_std
+    rng = np.random.default_rng(0)
+    data = offset + rng.standard_normal((20, 4, 1000))
+    data[0, :, 0] = offset + 50
+    data[1, 2, :10] = 0.
+    expected = np.square(data)
+    expected[expected == 0] = 1e-9
+    expected = np.std(expected, axis=(0, 2))
+    assert np.allclose(power_std(data, 1), expected, rtol=1e-13, atol=0)